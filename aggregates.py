@@ -0,0 +1,271 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+from data_loader import compact_counts
+from result_cache import DECODE_ERRORS, frame_from_bytes, frame_to_bytes, frames_supported, shared_cache
+from transforms import group_categories, wrap_labels
+
+GENDER_MEASURES = ['Men', 'Women']
+JOB_MEASURES = ['College_jobs', 'Non_college_jobs', 'Low_wage_jobs']
+
+# Columns each section reads; the dashboard loads only their union
+SECTION_COLUMNS = {
+    'gender': ['Major', 'Major_category'] + GENDER_MEASURES,
+    'salary': ['Major', 'Median', 'P25th', 'P75th', 'Major_category'],
+    'jobs': ['Major_category'] + JOB_MEASURES,
+}
+DASHBOARD_COLUMNS = list(dict.fromkeys(column for columns in SECTION_COLUMNS.values() for column in columns))
+
+# categories:      Major_category x measure table (Men, Women, Total and the job types), sorted by category
+# majors:          per-major Men/Women/Total, indexed by (Major_category, Major) so a category is one slice
+# category_majors: Major_category -> list of the majors in it
+# drill_downs:     Major_category -> that category's ready-to-plot per-major table (Major, Men, Women, Total,
+#                  Male/Female_Percentage and the wrapped Short_Major label), so a drill-down is a lookup
+# salaries:        one row per major -- Major/Median/P25th/P75th/Major_category plus the grouped category
+#                  used to color the salary chart
+Aggregates = namedtuple('Aggregates', ['categories', 'majors', 'category_majors', 'drill_downs', 'salaries'])
+
+# Rollups for the last few dataset versions: version -> Aggregates
+_MAX_VERSIONS = 4
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+# Compact columns are widened before summing: pandas can keep a narrow
+# dtype for the sum, which rounds (float32) or wraps (uint32) large totals
+_WIDE_DTYPES = {'f': 'float64', 'u': 'uint64', 'i': 'int64'}
+
+
+def _sum_by(data, keys, measures):
+    data = data.assign(**{m: data[m].astype(_WIDE_DTYPES[data[m].dtype.kind]) for m in measures})
+    return data.groupby(keys, observed=True)[measures].sum()
+
+
+def build_aggregates(data):
+    categories = _sum_by(data, 'Major_category', GENDER_MEASURES + JOB_MEASURES)
+    categories.insert(2, 'Total', categories['Men'] + categories['Women'])
+
+    majors = _sum_by(data, ['Major_category', 'Major'], GENDER_MEASURES)
+    majors['Total'] = majors['Men'] + majors['Women']
+    return _assemble(categories, majors, salary_data(data))
+
+
+def _assemble(categories, majors, salaries):
+    # The rollups derived from the category and major tables
+    category_majors = {
+        category: majors.loc[category].index.tolist()
+        for category in categories.index
+    }
+    return Aggregates(categories=categories, majors=majors, category_majors=category_majors,
+                      drill_downs=drill_down_index(majors), salaries=salaries)
+
+
+def drill_down_index(majors):
+    # Shares and labels for every major in one pass, then split by category
+    table = _with_shares(majors.reset_index())
+    table['Short_Major'] = wrap_labels(table['Major'])
+    return {
+        category: rows.drop(columns='Major_category').reset_index(drop=True)
+        for category, rows in table.groupby('Major_category', observed=True, sort=False)
+    }
+
+
+def get_aggregates(dataset):
+    # Built once per dataset version and shared by every rerun and session
+    # (and, with a result cache configured, by other processes too)
+    with _lock:
+        aggregates = _cache.get(dataset.version)
+        if aggregates is None:
+            shared = shared_cache()
+            if shared is None or not frames_supported():
+                aggregates = build_aggregates(dataset.frame)
+            else:
+                aggregates = _shared_aggregates(shared, dataset)
+            _cache[dataset.version] = aggregates
+            if len(_cache) > _MAX_VERSIONS:
+                _cache.popitem(last=False)
+        else:
+            _cache.move_to_end(dataset.version)
+        return aggregates
+
+
+# The result cache holds these tables (as Arrow data); the rest is derived from them again
+_SHARED_TABLES = ['categories', 'majors', 'salaries']
+
+
+def _shared_aggregates(shared, dataset):
+    keys = [('aggregates', dataset.version, name) for name in _SHARED_TABLES]
+    raws = [shared.get_bytes(key) for key in keys]
+    if all(raw is not None for raw in raws):
+        try:
+            return _assemble(*[frame_from_bytes(raw) for raw in raws])
+        except DECODE_ERRORS:
+            pass  # a damaged entry: rebuild them all and write them again
+    aggregates = build_aggregates(dataset.frame)
+    for key, name in zip(keys, _SHARED_TABLES):
+        shared.set_bytes(key, frame_to_bytes(getattr(aggregates, name)))
+    return aggregates
+
+
+def _with_shares(table):
+    table['Male_Percentage'] = table['Men'] / table['Total']
+    table['Female_Percentage'] = table['Women'] / table['Total']
+    return table
+
+
+def gender_by_category(aggregates, selected_categories):
+    # Slice the precomputed rows for the selection (in category order, like the old groupby)
+    selected_categories = set(selected_categories)
+    selected = [c for c in aggregates.categories.index if c in selected_categories]
+    table = aggregates.categories.loc[selected, ['Men', 'Women', 'Total']]
+    return _with_shares(table.rename_axis('Major_category').reset_index())
+
+
+class IncrementalGenderTotals:
+    # Per-session running state for Section 1: Men/Women/Total partial sums for the
+    # categories currently selected. A selection change only adds or drops the
+    # categories that changed instead of re-aggregating the whole selection.
+
+    def __init__(self, version):
+        self.version = version
+        self.selected = set()  # the last selection, including categories the data doesn't have
+        self.partials = {}  # category -> (Men, Women, Total), for the selected ones it has
+        self.table = None
+
+    def update(self, aggregates, selected_categories):
+        # Returns (gender_data, changed); gender_data matches gender_by_category()
+        selected_categories = set(selected_categories)
+        removed = self.selected - selected_categories
+        added = selected_categories - self.selected
+        self.selected = selected_categories
+        for category in removed:
+            self.partials.pop(category, None)
+        for category in added:
+            if category in aggregates.categories.index:
+                row = aggregates.categories.loc[category]
+                self.partials[category] = (row['Men'], row['Women'], row['Total'])
+
+        changed = bool(added or removed) or self.table is None
+        if changed:
+            categories = sorted(self.partials)
+            table = pd.DataFrame([self.partials[c] for c in categories], columns=['Men', 'Women', 'Total'],
+                                 dtype='float64')
+            table.insert(0, 'Major_category', categories)
+            self.table = _with_shares(table)
+        return self.table, changed
+
+
+def gender_by_major(aggregates, category):
+    return aggregates.drill_downs[category]
+
+
+def jobs_by_category(aggregates, exclude=()):
+    jobs = aggregates.categories[JOB_MEASURES].rename_axis('Major_category').reset_index()
+    return jobs[~jobs['Major_category'].isin(exclude)]
+
+
+# Salary chart: the biggest categories keep their own color, the rest are grouped into 'Other'
+CATEGORIES_TO_KEEP = [
+    'Engineering', 'Social Science', 'Physical Sciences',
+    'Agriculture & Natural Resources', 'Business', 'Law & Public Policy', 'Computers & Mathematics'
+]
+
+
+def salary_data(data):
+    # Extract relevant columns for the chart
+    salaries = data[['Major', 'Median', 'P25th', 'P75th', 'Major_category']].copy()
+    if salaries.duplicated(['Major_category', 'Major']).any():
+        salaries = _one_row_per_major(salaries)
+
+    # Group all other categories into 'Other'
+    salaries['Major_category_grouped'] = group_categories(salaries['Major_category'], CATEGORIES_TO_KEEP)
+    return salaries
+
+
+def _one_row_per_major(salaries):
+    # A major listed more than once (e.g. in several combined partitions) gets one bar:
+    # the quartiles of its rows' Median, as streaming.SummaryAccumulator reports them.
+    # A major with a single row keeps its own P25th/P75th.
+    grouped = salaries.groupby(['Major_category', 'Major'], observed=True, sort=False)
+    quartiles = grouped['Median'].quantile([0.25, 0.5, 0.75]).unstack()
+    quartiles.columns = ['P25th', 'Median', 'P75th']
+    single_row = grouped.size() == 1
+    own = grouped[['P25th', 'P75th']].first()
+    quartiles.loc[single_row, ['P25th', 'P75th']] = own.loc[single_row].to_numpy()
+    merged = quartiles.reset_index()
+    for column in ['Median', 'P25th', 'P75th']:
+        merged[column] = compact_counts(merged[column].round())
+    return merged[['Major', 'Median', 'P25th', 'P75th', 'Major_category']]
+
+
+def sort_salaries(salaries, sort_field, ascending):
+    if sort_field == 'Salary':
+        return salaries.sort_values(by='Median', ascending=ascending)
+    return salaries.sort_values(by=['Major_category_grouped', 'Median'], ascending=[True, ascending])
+
+
+# Above this many majors the salary chart switches to a bounded view
+# (top/bottom N, paging or a per-category summary) instead of one bar per major
+LARGE_DATA_ROWS = 2000
+SALARY_PAGE_SIZE = 100
+
+
+def salary_extremes(salaries, n):
+    # The n lowest and n highest paid majors, with everything in between folded into one 'Others' bar
+    if len(salaries) <= 2 * n:
+        return salaries
+    ranked = salaries.sort_values(by='Median')
+    middle = ranked.iloc[n:-n]
+    others = pd.DataFrame({
+        'Major': [f'Others ({len(middle):,} majors)'],
+        'Median': [middle['Median'].median()],
+        'P25th': [middle['Median'].quantile(0.25)],
+        'P75th': [middle['Median'].quantile(0.75)],
+        'Major_category': ['Median of the remaining majors'],
+        'Major_category_grouped': ['Other'],
+    })
+    return pd.concat([ranked.iloc[:n], others, ranked.iloc[-n:]], ignore_index=True)
+
+
+def salary_page_count(salaries, page_size=SALARY_PAGE_SIZE):
+    return max(1, -(-len(salaries) // page_size))
+
+
+def salary_page(sorted_salaries, page, page_size=SALARY_PAGE_SIZE):
+    # One window of the already sorted rows; page is zero-based
+    start = page * page_size
+    return sorted_salaries.iloc[start:start + page_size]
+
+
+def salary_summary(salaries, ascending=True):
+    # Five-number summary of median salaries per grouped category, one row per category
+    grouped = salaries.groupby('Major_category_grouped', observed=True)['Median']
+    summary = grouped.quantile([0.0, 0.25, 0.5, 0.75, 1.0]).unstack()
+    summary.columns = ['Min', 'P25th', 'Median', 'P75th', 'Max']
+    summary['Majors'] = grouped.size()
+    return summary.sort_values(by='Median', ascending=ascending).rename_axis('Major_category_grouped').reset_index()
+
+
+def salary_chart_data(salaries, sort_field, ascending, view='All', view_arg=None):
+    # Rows for the salary bar chart: all majors, the top/bottom `view_arg`, or page `view_arg` (zero-based)
+    if view == 'Top / Bottom':
+        salaries = salary_extremes(salaries, view_arg)
+
+    # Sort the salary data based on the user's selection
+    sorted_data = sort_salaries(salaries, sort_field, ascending)
+    if view == 'Pages':
+        sorted_data = salary_page(sorted_data, view_arg)
+    return sorted_data
+
+
+# Every sort the salary chart offers, as (Sort by, Order by) -> majors from the bottom of the axis up
+SALARY_SORTS = [(field, order) for field in ['Salary', 'Salary and Major Category'] for order in ['Ascending', 'Descending']]
+
+
+def salary_orderings(salaries):
+    return {
+        (field, order): sort_salaries(salaries, field, order == 'Ascending')['Major'].tolist()
+        for field, order in SALARY_SORTS
+    }
@@ -0,0 +1,224 @@
+"""Load test: concurrent dashboard sessions replaying interaction scripts.
+
+Drives final_streamlit.py headlessly through Streamlit's AppTest. Every
+session loads the page and then replays a user's interactions -- adding and
+removing categories, drilling down and back up, switching the salary sort and
+order, toggling the color coding -- choosing its values at random (seeded, so
+runs are repeatable), and each rerun is timed.
+
+The sessions run concurrently, each in its own process and all started
+together: AppTest swaps in a process-wide mock runtime for every run, so two
+sessions can't share an interpreter. They compete for the host's CPUs like one
+server's sessions do, but don't share its process-wide data and figure caches
+unless DATAVISU_CACHE is set. Each session count starts fresh processes, so one
+level never warms the next.
+
+For each session count it reports rerun latency percentiles per interaction
+and over all of them, reruns per second, and each session's CPU seconds and
+resident memory.
+
+    python benchmarks/loadtest.py [--sessions 1 4 16] [--loops 3] [--think-ms 0]
+                                  [--p90-budget-ms MS] [--json OUT]
+
+The app's DATAVISU_* environment variables (data source, result cache,
+compact figures, ...) apply as usual. With --p90-budget-ms it exits non-zero
+when any session count's p90 over all interactions (every rerun after the
+first load) goes over the budget.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, 'final_streamlit.py')
+
+DEFAULT_SESSIONS = [1, 4, 16]
+DEFAULT_LOOPS = 3
+PERCENTILES = [50, 90, 99]
+
+ALL_INTERACTIONS = 'interactions'
+
+# The category multiselect's max_selections
+MAX_CATEGORIES = 8
+
+
+def add_or_remove_category(at, rng):
+    widget = at.multiselect(key='majors_category')
+    unselected = [option for option in widget.options if option not in widget.value]
+    if unselected and len(widget.value) < MAX_CATEGORIES and (len(widget.value) <= 1 or rng.random() < 0.5):
+        widget.select(rng.choice(unselected))
+    else:
+        widget.unselect(rng.choice(widget.value))
+
+
+def drill_down(at, rng):
+    # The drill-down selectbox is the app's only selectbox; options[0] is 'None'
+    at.selectbox[0].select(rng.choice(at.selectbox[0].options[1:]))
+
+
+def drill_up(at, rng):
+    at.selectbox[0].select('None')
+
+
+def sort_field(at, rng):
+    widget = at.radio(key='salary_sort_field')
+    widget.set_value(rng.choice([option for option in widget.options if option != widget.value]))
+
+
+def sort_order(at, rng):
+    widget = at.radio(key='salary_sort_order')
+    widget.set_value('Descending' if widget.value == 'Ascending' else 'Ascending')
+
+
+def toggle_color(at, rng):
+    widget = at.checkbox(key='salary_color')
+    widget.set_value(not widget.value)
+
+
+# (step name, action) replayed after the first load, `loops` times
+INTERACTIONS = [
+    ('category', add_or_remove_category),
+    ('drill down', drill_down),
+    ('sort field', sort_field),
+    ('category', add_or_remove_category),
+    ('sort order', sort_order),
+    ('color', toggle_color),
+    ('drill down', drill_down),
+    ('drill up', drill_up),
+]
+
+
+def _rss():
+    # Current resident set size in bytes (peak size where /proc is not available)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_session(index, loops, think_ms, start_barrier):
+    # -> {'timings': [(step, seconds)], 'errors': n, plus the wall and CPU seconds from the start signal on}
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(index)
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    timings, errors = [], 0
+    start_barrier.wait()
+    session_start, cpu_start = time.perf_counter(), time.process_time()
+
+    steps = [('load', None)] + INTERACTIONS * loops
+    for step, action in steps:
+        if action is not None:
+            action(at, rng)
+        start = time.perf_counter()
+        at.run()
+        timings.append((step, time.perf_counter() - start))
+        errors += len(at.exception)
+        if think_ms:
+            time.sleep(think_ms / 1000)
+    return {'timings': timings, 'errors': errors, 'wall': time.perf_counter() - session_start,
+            'cpu': time.process_time() - cpu_start}
+
+
+def _quiet_streamlit():
+    # Keep Streamlit's bare-mode and deprecation warnings (once per rerun) out of the report
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    config.set_option('logger.level', 'error')
+    set_log_level('error')
+
+
+def _session_process(index, loops, think_ms, barrier, results):
+    _quiet_streamlit()
+    results.put(dict(run_session(index, loops, think_ms, barrier), rss=_rss()))
+
+
+def run_level(count, loops, think_ms):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    barrier = context.Barrier(count)
+    processes = [context.Process(target=_session_process, args=(i, loops, think_ms, barrier, results))
+                 for i in range(count)]
+
+    for process in processes:
+        process.start()
+    sessions = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return {
+        'sessions': count,
+        'elapsed': max(session['wall'] for session in sessions),
+        'timings': [timing for session in sessions for timing in session['timings']],
+        'errors': sum(session['errors'] for session in sessions),
+        'cpu_per_session': sum(session['cpu'] for session in sessions) / count,
+        'rss_per_session': sum(session['rss'] for session in sessions) / count,
+        'rss_max': max(session['rss'] for session in sessions),
+    }
+
+
+def summarize(level):
+    # step -> {'count', 'p50', 'p90', 'p99', 'max'} in ms, plus every rerun after the first load
+    by_step = {}
+    for step, seconds in level['timings']:
+        by_step.setdefault(step, []).append(seconds * 1000)
+    by_step[ALL_INTERACTIONS] = [seconds * 1000 for step, seconds in level['timings'] if step != 'load']
+    summary = {}
+    for step, values in by_step.items():
+        summary[step] = dict(zip([f'p{p}' for p in PERCENTILES], np.percentile(values, PERCENTILES).tolist()))
+        summary[step].update(count=len(values), max=max(values))
+    return summary
+
+
+def report(level, summary):
+    reruns = len(level['timings'])
+    print(f'\n{level["sessions"]} session(s): {reruns} reruns in {level["elapsed"]:.1f}s '
+          f'({reruns / level["elapsed"]:.1f}/s), {level["errors"]} error(s)')
+    print(f'  {"step":<12} {"reruns":>7}' + ''.join(f' {f"p{p}":>8}' for p in PERCENTILES) + f' {"max":>8}  ms')
+    for step, stats in summary.items():
+        print(f'  {step:<12} {stats["count"]:>7}' + ''.join(f' {stats[f"p{p}"]:>8.0f}' for p in PERCENTILES)
+              + f' {stats["max"]:>8.0f}')
+    print(f'  per session: CPU {level["cpu_per_session"]:.2f}s, resident memory '
+          f'{level["rss_per_session"] / 2 ** 20:.0f} MB (max {level["rss_max"] / 2 ** 20:.0f} MB)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS)
+    parser.add_argument('--loops', type=int, default=DEFAULT_LOOPS, help='times each session replays its script')
+    parser.add_argument('--think-ms', type=float, default=0, help='pause after each rerun')
+    parser.add_argument('--p90-budget-ms', type=float)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results, failures = [], []
+    for count in args.sessions:
+        level = run_level(count, args.loops, args.think_ms)
+        summary = summarize(level)
+        report(level, summary)
+        p90 = summary[ALL_INTERACTIONS]['p90']
+        if args.p90_budget_ms is not None and p90 > args.p90_budget_ms:
+            failures.append(f'{count} sessions: p90 {p90:.0f} ms exceeds {args.p90_budget_ms:.0f} ms')
+        if level['errors']:
+            failures.append(f'{count} sessions: {level["errors"]} rerun(s) raised')
+        results.append({key: value for key, value in level.items() if key != 'timings'} | {'latency_ms': summary})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    for failure in failures:
+        print('FAIL:', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Payload size of every dashboard chart, standard vs payload-optimized.
+
+Builds each chart the way the app does (default widget values) on the bundled
+CSV and on synthetic datasets scaled up from it, and reports the bytes
+st.plotly_chart would send for the figure as built and after compact_figure.
+
+    python benchmarks/payload.py [--scales 1 10 100]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import (LARGE_DATA_ROWS, build_aggregates, gender_by_category, gender_by_major,  # noqa: E402
+                        jobs_by_category, salary_chart_data, salary_orderings)
+from benchmarks.synthetic import synthetic_frame  # noqa: E402
+from figures import (client_side_salary_figure, compact_figure, drill_down_figure, gender_figure,  # noqa: E402
+                     jobs_figure, payload_bytes, salary_figure)
+
+DEFAULT_SCALES = [1, 10, 100]
+DRILL_DOWN_CATEGORY = 'Engineering'
+
+
+def charts(frame):
+    aggregates = build_aggregates(frame)
+    selection = aggregates.categories.index[:5].tolist()
+    salaries = aggregates.salaries
+    large = len(salaries) > LARGE_DATA_ROWS
+    sorted_data = salary_chart_data(salaries, 'Salary', True, 'Top / Bottom' if large else 'All', 25)
+
+    yield 'gender', lambda: gender_figure(gender_by_category(aggregates, selection), 'None')
+    yield 'drill-down', lambda: drill_down_figure(gender_by_major(aggregates, DRILL_DOWN_CATEGORY),
+                                                  DRILL_DOWN_CATEGORY)
+    yield 'salary', lambda: salary_figure(sorted_data, 'Salary', True, True)
+    if not large:
+        yield 'salary (browser)', lambda: client_side_salary_figure(salaries, salary_orderings(salaries))
+    yield 'jobs', lambda: jobs_figure(jobs_by_category(aggregates, exclude=['Interdisciplinary']))
+
+
+def run(scales):
+    for scale in scales:
+        frame = synthetic_frame(scale, distinct_majors=True)
+        print(f'\n{scale}x ({len(frame):,} rows)')
+        print(f'  {"chart":<18} {"standard":>10} {"compact":>10} {"saved":>7}')
+        for name, build in charts(frame):
+            fig = build()
+            standard, compact = payload_bytes(fig), payload_bytes(compact_figure(fig))
+            print(f'  {name:<18} {standard:>10,} {compact:>10,} {1 - compact / standard:>7.1%}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    args = parser.parse_args(argv)
+    run(args.scales)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Headless benchmark of the dashboard's data-to-figure pipeline.
+
+Runs every stage the sections go through -- parsing, rollups, gender and
+drill-down aggregation, salary sort/grouping, job-type aggregation, the
+streaming summary and the figure builders -- on the bundled CSV and on synthetic datasets scaled up
+from it, and reports the best wall time and peak traced memory per stage.
+
+    python benchmarks/pipeline.py [--scales 1 10 1000 100000] [--repeat 3] [--json OUT]
+
+The 100000x scale is ~17M rows and needs several GB of RAM. Before timing
+anything it checks that the streaming summary rolls up to the same per-major
+totals as the full frame, including rows with a blank Major or Major_category,
+and exits non-zero if not.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import (DASHBOARD_COLUMNS, LARGE_DATA_ROWS, build_aggregates, gender_by_category,  # noqa: E402
+                        gender_by_major, jobs_by_category, salary_chart_data, salary_data, salary_summary)
+from benchmarks.synthetic import synthetic_frame  # noqa: E402
+from data_loader import parse_csv  # noqa: E402
+from figures import drill_down_figure, gender_figure, jobs_figure, salary_figure, salary_summary_figure  # noqa: E402
+from streaming import SummaryAccumulator  # noqa: E402
+
+DEFAULT_SCALES = [1, 10, 1000]
+DEFAULT_SELECTION = ['Agriculture & Natural Resources', 'Arts', 'Biology & Life Science', 'Business',
+                     'Communications & Journalism']
+DRILL_DOWN_CATEGORY = 'Engineering'
+
+# CSV parsing is only benchmarked up to this many rows (writing the CSV dominates above that)
+MAX_PARSE_ROWS = 2_000_000
+
+
+def stages(frame):
+    # (name, callable) in pipeline order; later stages reuse earlier results through `state`
+    state = {}
+
+    def parse():
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False)
+        raw = buffer.getvalue().encode()
+        return lambda: parse_csv(raw, DASHBOARD_COLUMNS)
+
+    def build():
+        state['aggregates'] = build_aggregates(frame)
+        return state['aggregates']
+
+    def streamed_summary():
+        # One chunk's worth of streaming ingest: running sums plus salary sketches per major
+        accumulator = SummaryAccumulator()
+        accumulator.add(frame)
+        return accumulator.summary()
+
+    def salary_rows():
+        # What the app draws: every major, or one page once the dataset is large
+        view = 'All' if len(state['aggregates'].salaries) <= LARGE_DATA_ROWS else 'Pages'
+        return salary_chart_data(state['aggregates'].salaries, 'Salary', True, view, 0)
+
+    pipeline = [
+        ('build aggregates', build),
+        ('gender aggregation', lambda: gender_by_category(state['aggregates'], DEFAULT_SELECTION)),
+        ('drill-down aggregation', lambda: gender_by_major(state['aggregates'], DRILL_DOWN_CATEGORY)),
+        ('salary grouping', lambda: salary_data(frame)),
+        ('salary sort', salary_rows),
+        ('salary summary', lambda: salary_summary(state['aggregates'].salaries)),
+        ('streaming summary', streamed_summary),
+        ('job-type aggregation', lambda: jobs_by_category(state['aggregates'], exclude=['Interdisciplinary'])),
+        ('gender figure', lambda: gender_figure(gender_by_category(state['aggregates'], DEFAULT_SELECTION),
+                                                DRILL_DOWN_CATEGORY)),
+        ('drill-down figure', lambda: drill_down_figure(gender_by_major(state['aggregates'], DRILL_DOWN_CATEGORY),
+                                                        DRILL_DOWN_CATEGORY)),
+        ('salary figure', lambda: salary_figure(salary_rows(), 'Salary', True, True)),
+        ('salary summary figure', lambda: salary_summary_figure(salary_summary(state['aggregates'].salaries), True)),
+        ('job-type figure', lambda: jobs_figure(jobs_by_category(state['aggregates'], exclude=['Interdisciplinary']))),
+    ]
+    if len(frame) <= MAX_PARSE_ROWS:
+        pipeline.insert(0, ('parse csv', parse()))
+    return pipeline
+
+
+def check_streamed_summary():
+    # The streamed summary's per-major rollup must match build_aggregates on the rows themselves,
+    # with rows missing a key (which belong to no major) in the data and a chunk boundary in between
+    frame = synthetic_frame(2)
+    frame.loc[3, 'Major'] = np.nan
+    frame.loc[200, 'Major_category'] = np.nan
+    accumulator = SummaryAccumulator()
+    try:
+        accumulator.add(frame.iloc[:100])
+        accumulator.add(frame.iloc[100:])
+        streamed = build_aggregates(accumulator.summary()).majors.sort_index()
+    except Exception as error:
+        return [f'streaming a frame with blank keys raised {error!r}']
+    expected = build_aggregates(frame).majors.sort_index()
+    try:
+        pd.testing.assert_frame_equal(streamed, expected, check_dtype=False, check_index_type=False,
+                                      check_categorical=False)
+    except AssertionError as error:
+        return [f'streamed per-major totals differ: {error}']
+    return []
+
+
+def measure(func, repeat):
+    # Best wall time over `repeat` runs, then one traced run for peak memory
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(scales, repeat):
+    results = []
+    for scale in scales:
+        frame = synthetic_frame(scale, distinct_majors=True)
+        print(f'\n{scale}x ({len(frame):,} rows)')
+        print(f'  {"stage":<24} {"time (ms)":>12} {"peak memory (MB)":>18}')
+        for name, func in stages(frame):
+            seconds, peak = measure(func, repeat)
+            print(f'  {name:<24} {seconds * 1000:>12.2f} {peak / 2 ** 20:>18.2f}')
+            results.append({'scale': scale, 'rows': len(frame), 'stage': name,
+                            'seconds': seconds, 'peak_bytes': peak})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    failures = check_streamed_summary()
+    for failure in failures:
+        print('FAIL:', failure)
+    if failures:
+        return 1
+
+    results = run(args.scales, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Startup benchmark for the dashboard.
+
+Measures the cold import time of everything final_streamlit.py imports
+(via ``python -X importtime``; the list is read from the app's own import
+statements) and the latency of the first full render (via Streamlit's
+headless AppTest), each in a fresh interpreter, and fails when either goes
+over its budget. A second render, of a page that draws no plotly.express
+chart, must not load plotly.express at all.
+
+    python benchmarks/startup.py [--import-budget-ms 1500] [--render-budget-ms 5000]
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, 'final_streamlit.py')
+
+# Modules that must stay off the startup path
+FORBIDDEN_AT_IMPORT = ['matplotlib', 'seaborn', 'plotly.express']
+FORBIDDEN_AT_RENDER = ['matplotlib', 'seaborn']
+
+# Only the salary chart's default view is drawn with plotly.express; with the browser-sorted
+# view (session state below) no chart is, so the render must not load it
+NO_PX_STATE = {'salary_client_side': True}
+FORBIDDEN_WITHOUT_PX_CHARTS = FORBIDDEN_AT_RENDER + ['plotly.express']
+
+IMPORT_BUDGET_MS = 1500
+RENDER_BUDGET_MS = 5000
+
+_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+for key, value in json.loads(sys.argv[2]).items():
+    at.session_state[key] = value
+at.run()
+elapsed = time.perf_counter() - start
+if at.exception:
+    raise SystemExit('first render failed: %s' % at.exception[0].message)
+print(elapsed * 1000)
+print(','.join(sorted(sys.modules)))
+"""
+
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+
+def app_imports(path=APP_PATH):
+    # The top-level modules final_streamlit.py imports, in the order it imports them
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.append(node.module.split('.')[0])
+    return list(dict.fromkeys(names))
+
+
+def measure_imports(modules):
+    # Returns {module: cumulative import time in ms} for the modules imported directly by the
+    # statement (a module an earlier one already pulled in has no entry of its own)
+    result = _run(['-X', 'importtime', '-c', 'import ' + ', '.join(modules)])
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative) / 1000.0))
+    top = min(depth for depth, _, _ in entries)
+    return {name: ms for depth, name, ms in entries if depth == top and name in modules}, \
+        {name for _, name, _ in entries}
+
+
+def measure_render(state=None):
+    result = _run(['-c', _RENDER_SCRIPT, APP_PATH, json.dumps(state or {})])
+    lines = result.stdout.strip().splitlines()
+    return float(lines[-2]), set(lines[-1].split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--render-budget-ms', type=float, default=RENDER_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    failures = []
+
+    modules = app_imports()
+    timings, imported = measure_imports(modules)
+    import_ms = sum(timings.values())
+    print('Import time (python -X importtime):')
+    for name in modules:
+        if name in timings:
+            print(f'  {name:<20} {timings[name]:8.1f} ms')
+        else:
+            print(f'  {name:<20}   (loaded by an earlier import)')
+    print(f'  {"total":<20} {import_ms:8.1f} ms  (budget {args.import_budget_ms:.0f} ms)')
+    if import_ms > args.import_budget_ms:
+        failures.append(f'import time {import_ms:.0f} ms exceeds {args.import_budget_ms:.0f} ms')
+    for name in FORBIDDEN_AT_IMPORT:
+        if name in imported:
+            failures.append(f'{name} is imported at startup')
+
+    render_ms, modules = measure_render()
+    print(f'First render (AppTest):   {render_ms:8.1f} ms  (budget {args.render_budget_ms:.0f} ms)')
+    if render_ms > args.render_budget_ms:
+        failures.append(f'first render {render_ms:.0f} ms exceeds {args.render_budget_ms:.0f} ms')
+    for name in FORBIDDEN_AT_RENDER:
+        if name in modules:
+            failures.append(f'{name} is imported during the first render')
+
+    _, modules = measure_render(NO_PX_STATE)
+    print(f'Render without plotly.express charts: {", ".join(sorted(NO_PX_STATE))} set')
+    for name in FORBIDDEN_WITHOUT_PX_CHARTS:
+        if name in modules:
+            failures.append(f'{name} is imported during a render that draws no plotly.express chart')
+
+    for failure in failures:
+        print('FAIL:', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Synthetic grads datasets scaled up from the bundled CSV.
+
+    python benchmarks/synthetic.py FACTOR OUT.csv [--distinct-majors]
+
+Each replica of the 173 bundled rows gets jittered counts and salaries, like
+another survey year of the same majors. With distinct_majors every replica's
+majors get their own names instead (e.g. 'ZOOLOGY #12'), for a larger,
+occupational-style dataset.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import compact_counts, load_data  # noqa: E402
+
+JITTERED_COLUMNS = ['Total', 'Men', 'Women', 'Employed', 'Median', 'P25th', 'P75th',
+                    'College_jobs', 'Non_college_jobs', 'Low_wage_jobs']
+
+
+def synthetic_frame(factor, seed=0, distinct_majors=False):
+    base = load_data()
+    rng = np.random.default_rng(seed)
+    rows = len(base) * factor
+
+    frame = base.iloc[np.tile(np.arange(len(base)), factor)].reset_index(drop=True)
+    noise = rng.uniform(0.8, 1.2, rows)
+    noise[:len(base)] = 1.0  # the first replica is the real data
+    for column in JITTERED_COLUMNS:
+        frame[column] = compact_counts((frame[column].astype('float64') * noise).round())
+
+    if distinct_majors and factor > 1:
+        majors = base['Major'].cat.categories
+        replica = np.repeat(np.arange(factor), len(base))
+        codes = frame['Major'].cat.codes.to_numpy().astype('int64') + replica * len(majors)
+        names = [name if r == 0 else f'{name} #{r}' for r in range(factor) for name in majors]
+        frame['Major'] = pd.Categorical.from_codes(codes, categories=names)
+    return frame
+
+
+def write_synthetic_csv(factor, path, seed=0, distinct_majors=False):
+    frame = synthetic_frame(factor, seed, distinct_majors)
+    # Counts with gaps are floats in memory but whole numbers on disk
+    frame.to_csv(path, index=False, float_format='%.10g')
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('factor', type=int)
+    parser.add_argument('out')
+    parser.add_argument('--distinct-majors', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_synthetic_csv(args.factor, args.out, args.seed, args.distinct_majors)
+    print(f'Wrote {args.out} ({args.factor} x the bundled rows)')
+
+
+if __name__ == '__main__':
+    main()
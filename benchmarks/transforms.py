@@ -0,0 +1,87 @@
+"""Micro-benchmark: per-row lambdas vs. the vectorized transforms.
+
+Runs each hot-path transform the old way (``.apply``/``zip``) and through
+transforms.py on synthetic inputs (1M rows by default) and prints the
+throughput of both.
+
+    python benchmarks/transforms.py [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import textwrap
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import CATEGORIES_TO_KEEP  # noqa: E402
+from data_loader import load_data  # noqa: E402
+from transforms import format_percent, group_categories, stack_columns, wrap_labels  # noqa: E402
+
+
+def _legacy_wrap(label, width=15, max_lines=2):
+    wrapped = textwrap.wrap(label, width)
+    if len(wrapped) > max_lines:
+        wrapped = wrapped[:max_lines]
+        wrapped[-1] += "..."
+    return "<br>".join(wrapped)
+
+
+def make_inputs(rows, seed=0):
+    # Real category/major names, repeated and shuffled up to `rows`
+    data = load_data()
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(data), rows)
+    return pd.DataFrame({
+        'Major': data['Major'].to_numpy()[picks],
+        'Major_category': data['Major_category'].to_numpy()[picks],
+        'Men': data['Men'].to_numpy()[picks],
+        'Share': rng.random(rows),
+    })
+
+
+def cases(frame):
+    return [
+        ('category grouping',
+         lambda: frame['Major_category'].apply(lambda x: x if x in CATEGORIES_TO_KEEP else 'Other'),
+         lambda: group_categories(frame['Major_category'], CATEGORIES_TO_KEEP)),
+        ('percent labels',
+         lambda: frame['Share'].apply(lambda x: f'{x:.1%}'),
+         lambda: format_percent(frame['Share'])),
+        ('wrapped labels',
+         lambda: frame['Major'].apply(_legacy_wrap),
+         lambda: wrap_labels(frame['Major'])),
+        ('customdata',
+         lambda: list(zip(frame['Men'], frame['Major'])),
+         lambda: stack_columns(frame['Men'], frame['Major'])),
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    frame = make_inputs(args.rows)
+    print(f'{"transform":<20} {"legacy rows/s":>15} {"vectorized rows/s":>18} {"speedup":>8}')
+    for name, legacy, vectorized in cases(frame):
+        legacy_s = best_of(legacy, args.repeat)
+        vectorized_s = best_of(vectorized, args.repeat)
+        print(f'{name:<20} {args.rows / legacy_s:>15,.0f} {args.rows / vectorized_s:>18,.0f} {legacy_s / vectorized_s:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""The dashboard's cached charts, built and keyed the same way wherever they are needed.
+
+final_streamlit.py draws them and warm_cache.py builds them ahead of time, so
+both must agree on the figure_cache key (chart, dataset version, widget
+state) -- which is also the key of the cross-session result cache.
+"""
+from aggregates import gender_by_major, jobs_by_category, salary_chart_data, salary_orderings, salary_summary
+from figures import (client_side_salary_figure, compacted, drill_down_figure, figure_cache, jobs_figure,
+                     salary_figure, salary_summary_figure)
+
+# Section 2's inputs when the browser sorts and colors the chart itself
+CLIENT_SIDE_SALARY_INPUTS = (None, None, None, 'Browser', None, None)
+
+
+def salary_inputs_from_state(state, large_salary_data):
+    # Section 2's widgets keep their values in session state (or any dict of widget keys),
+    # so its inputs are known before the widgets are drawn (defaults match the widgets')
+    if not large_salary_data and state.get('salary_client_side', False):
+        return CLIENT_SIDE_SALARY_INPUTS
+    salary_view, salary_view_arg = 'All', None
+    if large_salary_data:
+        salary_view = state.get('salary_view', 'Top / Bottom')
+        if salary_view == 'Top / Bottom':
+            salary_view_arg = state.get('salary_extremes', 25)
+        elif salary_view == 'Pages':
+            salary_view_arg = state.get('salary_page', 1) - 1
+    return (state.get('salary_sort_field', 'Salary'), state.get('salary_sort_order', 'Ascending') == 'Ascending',
+            state.get('salary_color', True), salary_view, salary_view_arg,
+            salary_view != 'Summary' and state.get('salary_iqr', False))
+
+
+# Build the salary chart for this view/sort/color combination
+def build_salary_figure(aggregates, sort_field, ascending, color_by_category, salary_view, salary_view_arg, show_iqr):
+    if salary_view == 'Browser':
+        return client_side_salary_figure(aggregates.salaries, salary_orderings(aggregates.salaries))
+    if salary_view == 'Summary':
+        return salary_summary_figure(salary_summary(aggregates.salaries, ascending), color_by_category)
+
+    sorted_data = salary_chart_data(aggregates.salaries, sort_field, ascending, salary_view, salary_view_arg)
+    return salary_figure(sorted_data, sort_field, ascending, color_by_category, show_iqr)
+
+
+def salary_chart(dataset, aggregates, inputs):
+    return figure_cache.get(('salary', dataset.version) + inputs,
+                            compacted(lambda: build_salary_figure(aggregates, *inputs)))
+
+
+# Grouped bar chart from the precomputed job counts per Major Category
+def jobs_chart(dataset, aggregates):
+    return figure_cache.get(
+        ('jobs', dataset.version),
+        compacted(lambda: jobs_figure(jobs_by_category(aggregates, exclude=['Interdisciplinary']))),
+    )
+
+
+# Drill-down chart from the precomputed per-major totals
+def drill_down_chart(dataset, aggregates, category):
+    return figure_cache.get(
+        ('drill_down', dataset.version, category),
+        compacted(lambda: drill_down_figure(gender_by_major(aggregates, category), category)),
+    )
@@ -0,0 +1,359 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow comes with streamlit; headless tools fall back to the CSV
+    pa = feather = None
+
+# Snapshot bundled with the app, used when no other source is configured
+# and as the fallback when the configured source can't be read
+LOCAL_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recent-grads.csv')
+
+# Point the dashboard at another local path or an http(s) URL
+DATA_SOURCE_ENV = 'DATAVISU_DATA'
+
+# Every column's kind drives its compact in-memory representation:
+#   category -> pandas categorical (one copy of each distinct string)
+#   count    -> smallest unsigned int that holds it; float32 if it has gaps (one major
+#               has no gender breakdown) and every value is exact in float32
+#   rate     -> float32
+CATEGORY, COUNT, RATE = 'category', 'count', 'rate'
+SCHEMA = {
+    'Rank': COUNT,
+    'Major_code': COUNT,
+    'Major': CATEGORY,
+    'Total': COUNT,
+    'Men': COUNT,
+    'Women': COUNT,
+    'Major_category': CATEGORY,
+    'ShareWomen': RATE,
+    'Sample_size': COUNT,
+    'Employed': COUNT,
+    'Full_time': COUNT,
+    'Part_time': COUNT,
+    'Full_time_year_round': COUNT,
+    'Unemployed': COUNT,
+    'Unemployment_rate': RATE,
+    'Median': COUNT,
+    'P25th': COUNT,
+    'P75th': COUNT,
+    'College_jobs': COUNT,
+    'Non_college_jobs': COUNT,
+    'Low_wage_jobs': COUNT,
+}
+
+# Dtypes handed to read_csv; counts are narrowed after parsing, once their range is known
+PARSE_DTYPES = {CATEGORY: 'category', COUNT: 'float64', RATE: 'float32'}
+
+# `python ingest.py` writes an uncompressed Feather (Arrow IPC) file next to the CSV;
+# while it holds the CSV's current content it is memory-mapped and only the requested
+# columns are read. The CSV's content hash, size and mtime are kept in the file's schema
+# metadata: a matching size and mtime settle it, otherwise the CSV is hashed once per change.
+COLUMNAR_SUFFIX = '.feather'
+SOURCE_HASH_KEY = b'datavisu.source_sha1'
+SOURCE_SIZE_KEY = b'datavisu.source_size'
+SOURCE_MTIME_KEY = b'datavisu.source_mtime_ns'
+
+# Shared mode (DATAVISU_SHARED=1): every worker process on the host maps the same
+# columnar file instead of parsing its own copy. It is written once per source version,
+# by whichever process gets there first, into DATAVISU_SHARED_DIR (default /dev/shm/datavisu),
+# and replaces the source's older versions there. A local file's version is its mtime and
+# size; a URL is downloaded once per process, like any URL, and versioned by its content.
+# Numeric columns come out as read-only views of the mapping, so their pages are
+# shared through the OS page cache and memory stays flat as workers are added.
+SHARED_ENV = 'DATAVISU_SHARED'
+SHARED_DIR_ENV = 'DATAVISU_SHARED_DIR'
+
+# Streaming mode: CSVs bigger than STREAM_MIN_BYTES (or any source, with DATAVISU_STREAM=1)
+# are read in chunks and reduced to one row per major by streaming.py, as long as only the
+# dashboard's columns are requested. The summary's version is the content hash plus a suffix,
+# since its salary medians are estimates.
+STREAM_ENV = 'DATAVISU_STREAM'
+STREAM_MIN_BYTES = 1 << 30
+STREAM_VERSION_SUFFIX = '-summary'
+
+# frame:   the parsed data, shared by every section and session -- treat it as read-only
+# version: content hash of the raw file, used to key anything derived from the frame
+# source:  where the data was actually read from (after any fallback)
+Dataset = namedtuple('Dataset', ['frame', 'version', 'source'])
+
+# Process-wide cache: (source, columns) -> (cache key, Dataset)
+_cache = {}
+# Loads of one source are serialized by that source's lock, so a slow read (a URL,
+# a big CSV) never holds up loads of other sources; _lock only guards the dicts
+_source_locks = {}
+_lock = threading.Lock()
+
+# Sources that couldn't be read, while the bundled snapshot is served in their place:
+# source -> (time.monotonic() of the next attempt, current backoff in seconds).
+# The backoff doubles with every failed attempt, from RETRY_MIN_SECONDS to RETRY_MAX_SECONDS.
+_failures = {}
+RETRY_MIN_SECONDS = 30
+RETRY_MAX_SECONDS = 600
+
+
+def resolve_source(source=None):
+    return source or os.environ.get(DATA_SOURCE_ENV) or LOCAL_DATA_PATH
+
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+
+def _cache_key(source):
+    # URLs are fetched once per process; local files are re-read only when they change
+    if is_url(source):
+        return (source,)
+    stat = os.stat(source)
+    return (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+
+
+def _read_bytes(source):
+    if is_url(source):
+        with urllib.request.urlopen(source, timeout=10) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def content_hash(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+
+def file_hash(path):
+    # content_hash of a file, read in blocks instead of held in memory
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compact_counts(values):
+    if values.isna().any():
+        return values.astype('float32') if values.abs().max() < 2 ** 24 else values
+    return pd.to_numeric(values, downcast='unsigned' if values.min() >= 0 else 'integer')
+
+
+def parse_csv(raw, columns=None):
+    columns = list(columns or SCHEMA)
+    frame = pd.read_csv(io.BytesIO(raw), usecols=columns,
+                        dtype={column: PARSE_DTYPES[SCHEMA[column]] for column in columns})
+    for column in frame.columns:
+        if SCHEMA[column] == COUNT:
+            frame[column] = compact_counts(frame[column])
+    return frame
+
+
+def columnar_path(source):
+    return os.path.splitext(source)[0] + COLUMNAR_SUFFIX
+
+
+def write_columnar(raw, out_path, source_mtime_ns=None):
+    frame = parse_csv(raw)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Keep NaN as a float value rather than an Arrow null, so float columns map without a copy
+    for column in frame.columns:
+        if frame[column].dtype.kind == 'f':
+            index = table.schema.get_field_index(column)
+            table = table.set_column(index, column, pa.array(frame[column].to_numpy()))
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_HASH_KEY] = content_hash(raw).encode()
+    metadata[SOURCE_SIZE_KEY] = str(len(raw)).encode()
+    if source_mtime_ns is not None:
+        metadata[SOURCE_MTIME_KEY] = str(source_mtime_ns).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write next to the target and rename, so readers never map a half-written file
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def read_columnar(path, columns=None):
+    table = feather.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+    # split_blocks keeps each numeric column a zero-copy view of the mapped file
+    frame = table.to_pandas(split_blocks=True)
+    return frame, table.schema.metadata[SOURCE_HASH_KEY].decode()
+
+
+def _columnar_metadata(path):
+    # The schema metadata alone, without reading any column
+    with pa.memory_map(path) as f:
+        return pa.ipc.open_file(f).schema.metadata or {}
+
+
+# Last verdict per CSV: source -> ((CSV stat, columnar stat), fresh), so a CSV is hashed once per change
+_freshness = {}
+
+
+def _fresh_columnar_path(source):
+    # The columnar copy of a local CSV, if there is one and it was written from the CSV's current
+    # content. The CSV's size and mtime recorded in it settle that when they match; when only the
+    # mtime moved (a touch, or a copy with an older mtime put back by cp -p, rsync -t or git) the
+    # recorded content hash decides.
+    if feather is None or is_url(source):
+        return None
+    path = columnar_path(source)
+    try:
+        source_stat, columnar_stat = os.stat(source), os.stat(path)
+    except OSError:
+        return None
+    stats = (source_stat.st_mtime_ns, source_stat.st_size, columnar_stat.st_mtime_ns, columnar_stat.st_size)
+    known = _freshness.get(source)
+    if known is not None and known[0] == stats:
+        return path if known[1] else None
+
+    try:
+        metadata = _columnar_metadata(path)
+        size = str(source_stat.st_size).encode()
+        if metadata.get(SOURCE_SIZE_KEY, size) != size:
+            fresh = False
+        elif metadata.get(SOURCE_MTIME_KEY) == str(source_stat.st_mtime_ns).encode():
+            fresh = True
+        else:
+            fresh = metadata.get(SOURCE_HASH_KEY) == file_hash(source).encode()
+    except (OSError, pa.ArrowException):
+        fresh = False
+    _freshness[source] = (stats, fresh)
+    return path if fresh else None
+
+
+def shared_mode():
+    return feather is not None and os.environ.get(SHARED_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def shared_dir():
+    default_root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.environ.get(SHARED_DIR_ENV) or os.path.join(default_root, 'datavisu')
+
+
+def _shared_columnar_path(source, raw=None):
+    # <source id>-<version>.feather, written if missing (raw: a URL's content, already downloaded)
+    if is_url(source):
+        identity, version = source, content_hash(raw)
+    else:
+        identity = os.path.abspath(source)
+        version = hashlib.sha1(repr(_cache_key(source)).encode()).hexdigest()
+    prefix = hashlib.sha1(identity.encode()).hexdigest()[:16]
+    directory = shared_dir()
+    path = os.path.join(directory, f'{prefix}-{version[:16]}{COLUMNAR_SUFFIX}')
+    if not os.path.exists(path):
+        write_columnar(raw if raw is not None else _read_bytes(source), path)
+        _remove_other_versions(directory, prefix, path)
+    return path
+
+
+def _remove_other_versions(directory, prefix, current):
+    # Processes still mapping an old version keep their mapping; only new loads need the current one
+    for entry in os.scandir(directory):
+        if entry.name.startswith(prefix + '-') and entry.name.endswith(COLUMNAR_SUFFIX) and entry.path != current:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _read_shared_columnar(source, columns):
+    raw = _read_bytes(source) if is_url(source) else None
+    try:
+        return read_columnar(_shared_columnar_path(source, raw), columns)
+    except FileNotFoundError:
+        # The source changed and another process replaced this version between the check and the mapping
+        return read_columnar(_shared_columnar_path(source, raw), columns)
+
+
+def stream_mode(source):
+    if os.environ.get(STREAM_ENV, '').lower() in ('1', 'true', 'yes'):
+        return True
+    return not is_url(source) and os.stat(source).st_size > STREAM_MIN_BYTES
+
+
+def _load(source, columns):
+    from streaming import can_stream, stream_summary
+
+    columnar = _fresh_columnar_path(source)
+    key = (_cache_key(source), columnar and _cache_key(columnar))
+    with _lock:
+        cached = _cache.get((source, columns))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    if columnar is None and shared_mode():
+        frame, version = _read_shared_columnar(source, columns)
+        dataset = Dataset(frame=frame, version=version, source=source)
+    elif columnar:
+        frame, version = read_columnar(columnar, columns)
+        dataset = Dataset(frame=frame, version=version, source=source)
+    elif stream_mode(source) and can_stream(columns):
+        summary, version = stream_summary(source)
+        dataset = Dataset(frame=summary[list(columns)], version=version + STREAM_VERSION_SUFFIX, source=source)
+    else:
+        raw = _read_bytes(source)
+        dataset = Dataset(frame=parse_csv(raw, list(columns) if columns else None), version=content_hash(raw),
+                          source=source)
+    with _lock:
+        _cache[(source, columns)] = (key, dataset)
+    return dataset
+
+
+def _source_lock(source):
+    with _lock:
+        return _source_locks.setdefault(source, threading.Lock())
+
+
+def load_dataset(source=None, columns=None, fallback=True):
+    # columns: only parse these (all of them when None)
+    # fallback: serve the bundled snapshot when the source can't be read
+    source = resolve_source(source)
+    columns = tuple(columns) if columns else None
+    if not fallback or source == LOCAL_DATA_PATH:
+        with _source_lock(source):
+            return _load(source, columns)
+
+    with _source_lock(source):
+        # Checked under the source's lock, so reruns that queued behind a failed attempt don't repeat it
+        retry_at, backoff = _failures.get(source, (0, None))
+        if time.monotonic() >= retry_at:
+            try:
+                dataset = _load(source, columns)
+            except (OSError, ValueError):
+                # No network, a missing file or content that doesn't parse as the grads CSV
+                # (e.g. an HTML error page): serve the bundled snapshot instead, and back off
+                backoff = RETRY_MIN_SECONDS if backoff is None else min(backoff * 2, RETRY_MAX_SECONDS)
+                _failures[source] = (time.monotonic() + backoff, backoff)
+            else:
+                _failures.pop(source, None)
+                return dataset
+    return load_dataset(LOCAL_DATA_PATH, columns)
+
+
+def load_data(source=None, columns=None):
+    return load_dataset(source, columns).frame
+
+
+def memory_report(source=None):
+    # Bytes per column with pandas' inferred dtypes vs. the compact schema
+    raw = _read_bytes(resolve_source(source))
+    before = pd.read_csv(io.BytesIO(raw)).memory_usage(deep=True, index=False)
+    after = parse_csv(raw).memory_usage(deep=True, index=False)
+    return pd.DataFrame({'before': before, 'after': after})
+
+
+if __name__ == '__main__':
+    report = memory_report()
+    print(report.to_string())
+    before, after = report.sum()
+    print(f'\nTotal: {before:,} -> {after:,} bytes ({1 - after / before:.0%} smaller)')
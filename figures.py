@@ -0,0 +1,592 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from result_cache import DECODE_ERRORS, shared_cache
+from transforms import format_percent, stack_columns
+
+# Define the color mapping, including the grouped 'Other' category
+color_discrete_map = {
+    'Engineering': 'blue',
+    'Business': 'red',
+    'Law & Public Policy': 'orange',
+    'Computers & Mathematics': 'purple',
+    'Agriculture & Natural Resources': 'green',
+    'Social Science': 'pink',
+    'Physical Sciences': 'yellow',
+    'Other': 'turquoise'  # Assign a color to the 'Other' category
+}
+
+
+class FigureCache:
+    # Bounded LRU of built figures, keyed on everything a chart depends on
+    # (chart name, dataset version and the widget values that feed it).
+    # A miss first tries the cross-session result cache (result_cache.py, when
+    # configured), which keeps the figure's JSON for other processes and later runs.
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            figure = self._entries.get(key)
+            if figure is not None:
+                self._entries.move_to_end(key)
+                return figure
+        figure = self._shared_get(key, build)
+        with self._lock:
+            self._entries[key] = figure
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return figure
+
+    def _shared_get(self, key, build):
+        shared = shared_cache()
+        if shared is None:
+            return build()
+        # The compact mode and default template are fixed per process, but not across processes
+        # (a figure built outside Streamlit has plotly's template baked into its colors)
+        shared_key = ('figure', compact_enabled(), pio.templates.default) + tuple(key)
+        raw = shared.get_bytes(shared_key)
+        if raw is not None:
+            try:
+                return pio.from_json(raw.decode())
+            except DECODE_ERRORS:
+                pass  # a damaged entry: rebuild it and write it again
+        figure = build()
+        shared.set_bytes(shared_key, figure.to_json().encode())
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by every session in the process
+figure_cache = FigureCache()
+
+
+# Function to set text color with adjusted opacity
+def get_text_color(opacity):
+    return f'rgba(0, 0, 0, {opacity})'
+
+
+def gender_opacity(gender_data, selected_category):
+    # Adjust opacity for the original graph
+    opacity_values = [1.0] * len(gender_data)  # Default to full opacity for all bars
+    if selected_category and selected_category != 'None':
+        opacity_values = [1.0 if cat == selected_category else 0.2 for cat in gender_data['Major_category']]
+    return opacity_values
+
+
+def gender_figure(gender_data, selected_category):
+    opacity_values = gender_opacity(gender_data, selected_category)
+
+    # Create the normalized stacked bar chart
+    fig = go.Figure()
+
+    # Bar for Male Percentage
+    fig.add_trace(go.Bar(
+        x=gender_data['Major_category'],
+        y=gender_data['Male_Percentage'],
+        name='Male',
+        marker=dict(color='#1f77b4', opacity=opacity_values),
+        text=format_percent(gender_data['Male_Percentage']),
+        textposition='auto',
+        hovertemplate = 'Count: %{customdata}<extra></extra>',
+        customdata = gender_data['Men'],
+        hoverlabel=dict(namelength=0)
+
+    ))
+
+    # Bar for Female Percentage
+    fig.add_trace(go.Bar(
+        x=gender_data['Major_category'],
+        y=gender_data['Female_Percentage'],
+        name='Female',
+        marker=dict(color='pink', opacity=opacity_values),
+        text=format_percent(gender_data['Female_Percentage']),
+        textposition='auto',
+        hovertemplate='Count: %{customdata}<extra></extra>',
+        customdata=gender_data['Women'],
+        hoverlabel=dict(namelength=0)
+
+    ))
+
+    # Center the title and legend in the main chart
+    fig.update_layout(
+        title={
+            'text': 'Gender Distribution by Major Category',
+            'x': 0.5,  # Center the title
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        legend=dict(
+            orientation="v",
+            yanchor="middle",
+            y=0.5,
+            xanchor="right",
+            x=1.15  # Center the legend
+        ),
+        xaxis_title='Major Category',
+        yaxis_title='Percentage',
+        yaxis=dict(range=[0, 1], tickformat=".0%"),
+        barmode='stack'
+    )
+    return fig
+
+
+class IncrementalGenderFigure:
+    # Per-session Section 1 chart that is patched in place instead of rebuilt:
+    # new bar data only when the category selection changed, otherwise just the
+    # opacities when the drill-down highlight moved, and nothing when neither did.
+
+    def __init__(self):
+        self.figure = None
+        self.selected_category = None
+
+    def update(self, gender_data, selected_category, data_changed):
+        if self.figure is None:
+            self.figure = gender_figure(gender_data, selected_category)
+        elif data_changed or selected_category != self.selected_category:
+            opacity_values = gender_opacity(gender_data, selected_category)
+            with self.figure.batch_update():
+                for trace, share, count in zip(self.figure.data, ['Male_Percentage', 'Female_Percentage'],
+                                               ['Men', 'Women']):
+                    if data_changed:
+                        trace.x = gender_data['Major_category']
+                        trace.y = gender_data[share]
+                        trace.text = format_percent(gender_data[share])
+                        trace.customdata = gender_data[count]
+                    trace.marker.opacity = opacity_values
+        self.selected_category = selected_category
+        return self.figure
+
+
+def drill_down_figure(major_gender_data, selected_category):
+    # major_gender_data: a table from the drill-down index (gender_by_major), labels already wrapped
+    # Create the drill-down bar chart
+    drill_fig = go.Figure()
+
+    # Bar for Male Percentage in the selected major category
+    drill_fig.add_trace(go.Bar(
+        x=major_gender_data['Short_Major'],
+        y=major_gender_data['Male_Percentage'],
+        name='Male',
+        marker=dict(color='#1f77b4'),
+        hovertemplate='%{customdata[1]}<br>Male: %{y:.1%}<br>Count: %{customdata[0]}<extra></extra>',
+        customdata=stack_columns(major_gender_data['Men'], major_gender_data['Major']),
+        hoverlabel=dict(namelength=0)
+    ))
+
+    # Bar for Female Percentage in the selected major category
+    drill_fig.add_trace(go.Bar(
+        x=major_gender_data['Short_Major'],
+        y=major_gender_data['Female_Percentage'],
+        name='Female',
+        marker=dict(color='pink'),
+        hovertemplate='%{customdata[1]}<br>Female: %{y:.1%}<br>Count: %{customdata[0]}<extra></extra>',
+        customdata=stack_columns(major_gender_data['Women'], major_gender_data['Major']),
+        hoverlabel=dict(namelength=0)
+    ))
+
+    # Update layout for the drill-down stacked bar chart
+    drill_fig.update_layout(
+        title={
+            'text': f'Gender Distribution in {selected_category} majors',
+            'x': 0.5,  # Center the title
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        legend=dict(
+            orientation="v",
+            yanchor="middle",
+            y=0.5,
+            xanchor="right",
+            x=1.15  # Center the legend
+        ),
+        xaxis_title='Major',
+        yaxis_title='Percentage',
+        yaxis=dict(range=[0, 1], tickformat=".0%"),
+        xaxis=dict(
+            rangeslider=dict(
+                visible=True,
+                thickness=0.05,
+                bgcolor="#E0E0E0",  # Set background color to gray
+                borderwidth=0
+            ),
+            fixedrange=True,  # Allow zooming and scrolling
+            range=[-0.5,  min(len(major_gender_data), 7.5)],
+            autorange=False,  # Disable auto-ranging to keep the range fixed
+
+        ),
+        barmode='stack',
+
+    )
+    return drill_fig
+
+
+def salary_figure(sorted_data, sort_field, ascending, color_by_category, show_iqr=False):
+    # Calculate the height of the chart to fit all rows (25 pixels per row)
+    chart_height = max(800, 25 * len(sorted_data)//10)
+
+    # Set the column for color coding based on the checkbox value
+    color_arg = 'Major_category_grouped' if color_by_category else None
+
+    # Optional whiskers from P25th to P75th around each median, with both quartiles in the hover
+    iqr_args, custom_data, iqr_hover = {}, ['Major_category'], ''
+    if show_iqr:
+        median = sorted_data['Median'].astype('float64')
+        sorted_data = sorted_data.assign(IQR_high=sorted_data['P75th'].astype('float64') - median,
+                                         IQR_low=median - sorted_data['P25th'].astype('float64'))
+        iqr_args = dict(error_x='IQR_high', error_x_minus='IQR_low')
+        custom_data = ['Major_category', 'P25th', 'P75th']
+        iqr_hover = '<br><b>25th-75th Percentile:</b> %{customdata[1]} - %{customdata[2]}'
+
+    # plotly.express is slow to import and only this chart needs it
+    import plotly.express as px
+
+    # Recreate the horizontal bar chart with sorted data
+    fig = px.bar(
+        sorted_data,
+        x='Median',
+        y='Major',
+        color=color_arg,  # Conditionally apply color coding
+        color_discrete_map=color_discrete_map if color_by_category else None,  # Use the fixed color mapping if applicable
+        orientation='h',
+        title='Median Salaries by Major',
+        labels={'Median': 'Median Salary (per thousand dollars)', 'Major': 'Academic Major', 'Major_category_grouped': 'Major Category'},
+        height=chart_height,
+        custom_data=custom_data,  # Include the original category in custom data,
+        **iqr_args,
+    )
+
+    fig.update_traces(
+        hovertemplate='<b>Major:</b> %{y}<br><b>Median Salary:</b> %{x}<br>' +
+                      '<b>Major Category:</b> %{customdata[0]}' + iqr_hover + '<extra></extra>',
+    )
+
+    fig.update_layout(title={'text': 'Median Salaries by Major', 'x': 0.5, 'xanchor': 'center'},
+                      legend=dict(
+                          orientation='v',
+                          yanchor='top',
+                          y=1,
+                          xanchor='left',
+                          x=1.05,
+                          font=dict(size=14),
+                          traceorder='reversed',
+                          title=dict(text='Major Categories', font=dict(size=16, color='black', family='Arial')),),
+
+                      xaxis=dict(
+                          showgrid=True,  # Show vertical grid lines
+                          gridcolor='darkgray',  # Set the color of the grid lines
+                          gridwidth=1,  # Set the width of the grid lines
+                          range=[0, 115000]  # Limit the x-axis range to 0 to 100
+
+                      ),
+                      plot_bgcolor='white',  # Set the background color of the plot area
+
+                      )  # Center the title
+
+    # Update layout to enforce sorting if sorted by Median (Salary)
+    if sort_field == 'Salary':
+        fig.update_layout(
+            yaxis=dict(categoryorder='total ascending' if ascending else 'total descending'),
+        )
+    return fig
+
+
+def jobs_figure(grouped_data):
+    # Create the figure
+    fig = go.Figure()
+
+    # Add bars for each job type
+    fig.add_trace(go.Bar(
+        x=grouped_data['Major_category'],
+        y=grouped_data['College_jobs'],
+        name='College Jobs',
+        marker=dict(color='darkgray'),
+        hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
+
+    ))
+
+    fig.add_trace(go.Bar(
+        x=grouped_data['Major_category'],
+        y=grouped_data['Non_college_jobs'],
+        name='Non-College Jobs',
+        marker=dict(color='rgba(26, 118, 255, 0.7)'),
+        hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
+
+    ))
+
+    fig.add_trace(go.Bar(
+        x=grouped_data['Major_category'],
+        y=grouped_data['Low_wage_jobs'],
+        name='Low Wage Service Jobs',
+        marker=dict(color='orange'),
+        hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
+
+    ))
+
+    # Update layout for better visibility and styling
+    fig.update_layout(
+        title={
+            'text': 'Employment Types by Major Category: College, Non-College, and Service Jobs',
+            'x': 0.5,  # Center the title horizontally
+            'xanchor': 'center'  # Align the title to the center
+        },
+        xaxis_title='Major Category',
+        yaxis_title='Number of Jobs',
+        barmode='group',  # Group bars side by side
+        template='plotly_white'
+    )
+    return fig
+
+
+def client_side_salary_figure(salaries, orderings):
+    # The whole salary table is shipped once; Plotly buttons re-sort (y-axis category
+    # order) and recolor (marker colors/legend) it in the browser without a rerun.
+    # orderings: (Sort by, Order by) -> majors in axis order, as from aggregates.salary_orderings
+    default_order = orderings[('Salary', 'Ascending')]
+    groups = salaries.set_index('Major').loc[default_order, 'Major_category_grouped'].astype(str).unique()
+
+    fig = go.Figure()
+    for group in groups:
+        rows = salaries[salaries['Major_category_grouped'] == group]
+        fig.add_trace(go.Bar(
+            x=rows['Median'],
+            y=rows['Major'],
+            name=group,
+            orientation='h',
+            marker=dict(color=color_discrete_map.get(group)),
+            customdata=stack_columns(rows['Major_category']),
+            hovertemplate='<b>Major:</b> %{y}<br><b>Median Salary:</b> %{x}<br>' +
+                          '<b>Major Category:</b> %{customdata[0]}<extra></extra>',
+        ))
+
+    colors = [color_discrete_map.get(group) for group in groups]
+    sort_buttons = [
+        dict(label=f'{field} ({order.lower()})', method='relayout',
+             args=[{'yaxis.categoryorder': 'array', 'yaxis.categoryarray': majors}])
+        for (field, order), majors in orderings.items()
+    ]
+    color_buttons = [
+        dict(label='Color by category', method='restyle', args=[{'marker.color': colors, 'showlegend': True}]),
+        dict(label='Single color', method='restyle',
+             args=[{'marker.color': ['#636efa'] * len(groups), 'showlegend': False}]),
+    ]
+
+    fig.update_layout(title={'text': 'Median Salaries by Major', 'x': 0.5, 'xanchor': 'center'},
+                      height=max(800, 25 * len(salaries)//10),
+                      barmode='relative',
+                      xaxis=dict(
+                          title='Median Salary (per thousand dollars)',
+                          showgrid=True,  # Show vertical grid lines
+                          gridcolor='darkgray',  # Set the color of the grid lines
+                          gridwidth=1,  # Set the width of the grid lines
+                          range=[0, 115000]
+                      ),
+                      yaxis=dict(title='Academic Major', categoryorder='array', categoryarray=default_order),
+                      legend=dict(
+                          orientation='v',
+                          yanchor='top',
+                          y=1,
+                          xanchor='left',
+                          x=1.05,
+                          font=dict(size=14),
+                          traceorder='reversed',
+                          title=dict(text='Major Categories', font=dict(size=16, color='black', family='Arial')),),
+                      updatemenus=[
+                          dict(type='dropdown', buttons=sort_buttons, active=list(orderings).index(('Salary', 'Ascending')),
+                               x=0, xanchor='left', y=1.03, yanchor='bottom', showactive=True),
+                          dict(type='buttons', direction='right', buttons=color_buttons, active=0,
+                               x=0.35, xanchor='left', y=1.03, yanchor='bottom', showactive=True),
+                      ],
+                      plot_bgcolor='white',  # Set the background color of the plot area
+                      )
+    return fig
+
+
+def salary_summary_figure(summary, color_by_category):
+    # Box per grouped category drawn from precomputed quartiles, so the payload
+    # stays the same size however many majors the dataset has
+    fig = go.Figure()
+    for row in summary.itertuples(index=False):
+        color = color_discrete_map.get(row.Major_category_grouped) if color_by_category else '#1f77b4'
+        fig.add_trace(go.Box(
+            y=[row.Major_category_grouped],
+            q1=[row.P25th],
+            median=[row.Median],
+            q3=[row.P75th],
+            lowerfence=[row.Min],
+            upperfence=[row.Max],
+            orientation='h',
+            name=f'{row.Major_category_grouped} ({row.Majors:,} majors)',
+            marker=dict(color=color),
+            showlegend=color_by_category,
+        ))
+
+    fig.update_layout(title={'text': 'Median Salaries by Major Category', 'x': 0.5, 'xanchor': 'center'},
+                      xaxis=dict(
+                          title='Median Salary (per thousand dollars)',
+                          showgrid=True,  # Show vertical grid lines
+                          gridcolor='darkgray',  # Set the color of the grid lines
+                          gridwidth=1,  # Set the width of the grid lines
+                          range=[0, 115000]
+                      ),
+                      yaxis=dict(title='Major Category'),
+                      legend=dict(
+                          orientation='v',
+                          yanchor='top',
+                          y=1,
+                          xanchor='left',
+                          x=1.05,
+                          font=dict(size=14),
+                          traceorder='reversed',
+                          title=dict(text='Major Categories', font=dict(size=16, color='black', family='Arial')),),
+                      height=800,
+                      plot_bgcolor='white',  # Set the background color of the plot area
+                      )
+    return fig
+
+
+# Payload-optimized figures (DATAVISU_COMPACT_FIGURES=1): the same charts with
+# less JSON to ship. Numeric point data goes as the narrowest typed array plotly
+# can base64-encode, category labels that only label an axis are sent once as
+# tick text (bars then sit at integer positions), and per-point hover strings
+# are inlined into the hovertemplate when constant or moved out of nested
+# customdata rows when not.
+COMPACT_ENV = 'DATAVISU_COMPACT_FIGURES'
+
+# Typed arrays plotly.js can decode, smallest first
+_TYPED_INTS = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]
+_CUSTOMDATA_REF = re.compile(r'%\{customdata(?:\[(\d+)\])?([^}]*)\}')
+
+
+def compact_enabled():
+    return os.environ.get(COMPACT_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def payload_bytes(fig):
+    # What st.plotly_chart sends for this figure
+    return len(pio.to_json(fig, validate=False).encode())
+
+
+def _is_numeric(values):
+    return values.dtype.kind in 'iuf' or (len(values) and all(isinstance(v, (int, float, np.number)) for v in values))
+
+
+def _typed(values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype('float64')
+    if values.dtype.kind == 'f' and len(values) and np.isfinite(values).all() and (values == np.round(values)).all():
+        values = values.astype('int64')
+    if values.dtype.kind in 'iu' and len(values):
+        low, high = values.min(), values.max()
+        for dtype in _TYPED_INTS:
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return values.astype(dtype)
+        return values.astype('float64')
+    return values
+
+
+def _replace(obj, name, value):
+    # plotly skips assignments equal to the current value, which would keep the old dtype
+    obj[name] = None
+    obj[name] = value
+
+
+def _compact_hover(trace):
+    # Splits customdata into numeric columns (kept, typed) and string columns
+    # (inlined when constant, or one of them moved to hovertext); leaves the
+    # trace alone when its customdata doesn't fit that
+    if trace.customdata is None or not trace.hovertemplate:
+        return
+    data = np.asarray(trace.customdata, dtype=object)
+    columns = list(data.T) if data.ndim == 2 else [data]
+    kept, replacements, hovertext = [], {}, None
+    for i, column in enumerate(columns):
+        if _is_numeric(column):
+            kept.append(i)
+        elif len(set(column)) == 1:
+            replacements[i] = str(column[0]).replace('%', '%%')
+        elif hovertext is None and trace.hovertext is None:
+            hovertext = column.astype(str)
+            replacements[i] = '%{hovertext}'
+        else:
+            return
+    if len(kept) > 1:
+        return
+
+    def replace(match):
+        i = int(match.group(1) or 0)
+        if i in replacements:
+            return replacements[i]
+        return '%{customdata' + match.group(2) + '}'
+
+    trace.hovertemplate = _CUSTOMDATA_REF.sub(replace, trace.hovertemplate)
+    _replace(trace, 'customdata', _typed(columns[kept[0]]) if kept else None)
+    if hovertext is not None:
+        trace.hovertext = hovertext
+
+
+def _encode_axis_categories(fig, axis):
+    # Bars on a categorical axis that hover never shows: send the labels once as
+    # tick text and the bars as integer positions
+    letter = axis[0]
+    traces = [trace for trace in fig.data if (getattr(trace, letter + 'axis', None) or letter) == letter]
+    layout_axis = fig.layout[axis]
+    if not traces or layout_axis.type not in (None, 'category') or layout_axis.categoryorder not in (None, 'trace'):
+        return
+    for trace in traces:
+        values = trace[letter]
+        if (trace.type != 'bar' or values is None or _is_numeric(np.asarray(values, dtype=object)) or
+                f'%{{{letter}' in (trace.hovertemplate or '')):
+            return
+
+    labels = list(dict.fromkeys(label for trace in traces for label in trace[letter]))
+    # Only worth it when the labels repeat across traces by more than the typed
+    # positions (one array per trace plus tickvals) and the axis settings cost
+    label_bytes = len(json.dumps(labels))
+    if (len(traces) - 1) * label_bytes <= (len(traces) + 1) * (len(labels) * 4 // 3 + 30) + 70:
+        return
+    positions = {label: i for i, label in enumerate(labels)}
+    with fig.batch_update():
+        for trace in traces:
+            _replace(trace, letter, _typed([positions[label] for label in trace[letter]]))
+        layout_axis.update(type='linear', tickmode='array', tickvals=_typed(range(len(labels))), ticktext=labels)
+        if layout_axis.range is None:
+            layout_axis.range = [-0.5, len(labels) - 0.5]
+
+
+def compacted(build):
+    # A figure builder for figure_cache that builds the compact figure in compact mode
+    if not compact_enabled():
+        return build
+    return lambda: compact_figure(build())
+
+
+def compact_figure(fig):
+    fig = go.Figure(fig)
+    for trace in fig.data:
+        _compact_hover(trace)
+    _encode_axis_categories(fig, 'xaxis')
+    _encode_axis_categories(fig, 'yaxis')
+    for trace in fig.data:
+        for name in ('x', 'y'):
+            values = trace[name]
+            if values is not None and _is_numeric(np.asarray(values, dtype=object)):
+                _replace(trace, name, _typed(values))
+    return fig
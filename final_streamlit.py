@@ -1,14 +1,22 @@
+import uuid
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-import textwrap
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from aggregates import DASHBOARD_COLUMNS, LARGE_DATA_ROWS, IncrementalGenderTotals, get_aggregates, salary_page_count
+from charts import CLIENT_SIDE_SALARY_INPUTS, drill_down_chart, jobs_chart, salary_chart, salary_inputs_from_state
+from data_loader import load_dataset
+from figures import IncrementalGenderFigure, compact_enabled, compact_figure, payload_bytes
+from parallel import submit
+from profiling import enabled as profiling_enabled
+from profiling import finish_run, record_payload, stage, start_run
+from refresh import get_refresher, refresh_interval
+from registry import data_dir, get_registry
 
 
 st.set_page_config(layout="wide")
+
+# Time every stage of this rerun (see profiling.py for the debug panel and JSONL log)
+profile_run = start_run(session=st.session_state.setdefault('profile_session', uuid.uuid4().hex[:12]))
 # Custom styles for each section
 
 st.markdown(
@@ -79,12 +87,73 @@ st.markdown("<hr style='border: 0.5px solid #ddd;'>", unsafe_allow_html=True)
 
 ### FIRST VISU ####
 
-# Load the data
-#data = pd.read_csv(r'/Users/rubenchocron/Documents/Data Science BSC/year3/recent-grads (1).csv')
-data_url = "https://raw.githubusercontent.com/rubychoc/datavisu/main/recent-grads.csv"
+# With DATAVISU_DATA_DIR set, the sidebar picks which partitions (years, regions, ...) of that
+# directory to show; only the selected ones are loaded, each cached on its own
+registry = get_registry() if data_dir() else None
+if registry is not None:
+    partitions = {p.name: p for p in registry.partitions(columns=DASHBOARD_COLUMNS)}
+    selected_partitions = st.sidebar.multiselect(
+        'Datasets',
+        options=list(partitions),
+        default=list(partitions)[:1],
+        format_func=lambda name: f'{name} ({partitions[name].rows:,} rows)',
+        key='datasets'
+    )
+    if not selected_partitions:
+        st.info('Select at least one dataset in the sidebar.')
+        st.stop()
+
+# With DATAVISU_REFRESH set, a background thread watches the source and swaps in new data and
+# rollups when it changes; reruns only read its current snapshot (no file or network access)
+snapshot = get_refresher(columns=DASHBOARD_COLUMNS).current() if registry is None and refresh_interval() else None
+
+# Load the columns the dashboard uses once per process (bundled CSV, or DATAVISU_DATA path/URL); shared by all sections
+with stage('Data', 'load'):
+    if registry is not None:
+        dataset = registry.load(selected_partitions, columns=DASHBOARD_COLUMNS)
+    elif snapshot is not None:
+        dataset = snapshot.dataset
+    else:
+        dataset = load_dataset(columns=DASHBOARD_COLUMNS)
+
+# Per-category and per-major rollups, built once per dataset version
+with stage('Data', 'aggregates'):
+    aggregates = snapshot.aggregates if snapshot is not None else get_aggregates(dataset)
+
+# Large datasets get a bounded salary view instead of one bar per major
+large_salary_data = len(aggregates.salaries) > LARGE_DATA_ROWS
+
+# Smaller datasets can ship every sort order at once and sort/recolor in the browser
+client_side = not large_salary_data and st.session_state.get('salary_client_side', False)
 
-# Load the data directly from the GitHub URL
-data = pd.read_csv(data_url)
+
+# Build (or reuse) the salary chart for this view/sort/color combination (see charts.py)
+def get_salary_figure(salary_inputs):
+    with stage('Section 2', 'figure build'):
+        return salary_chart(dataset, aggregates, salary_inputs)
+
+
+# Build (or reuse) the grouped bar chart from the precomputed job counts per Major Category
+def get_jobs_figure():
+    with stage('Section 3', 'figure build'):
+        return jobs_chart(dataset, aggregates)
+
+
+# Draw a chart as a timed render stage, and record how many bytes it sent when profiling
+# (DATAVISU_COMPACT_FIGURES=1 switches every chart to its payload-optimized form)
+def show_chart(fig, section, stage_name, chart):
+    with stage(section, stage_name):
+        st.plotly_chart(fig, use_container_width=True)
+    if profiling_enabled():
+        record_payload(section, chart, payload_bytes(fig))
+
+
+# Sections 2 and 3 don't depend on Section 1: build their figures on worker threads
+# while Section 1 renders, and pick them up in page order
+# (Section 2's inputs for this rerun come from its widgets' values in session state)
+expected_salary_inputs = salary_inputs_from_state(st.session_state, large_salary_data)
+salary_future = submit(get_salary_figure, expected_salary_inputs)
+jobs_future = submit(get_jobs_figure)
 st.markdown("""
     <div style="font-size:30px; font-weight: bold; margin-top: 30px; margin-bottom: 10px;">
     Section 1: Understanding Gender Dynamics Across Academic Majors
@@ -99,187 +168,45 @@ st.markdown("""
 """, unsafe_allow_html=True)
 st.markdown("<br>", unsafe_allow_html=True)
 
-selected_majors = st.multiselect('Select Major Categories', options=sorted(data['Major_category'].unique()), default=sorted(data['Major_category'].unique())[:5], max_selections=8, key = 'majors_category')
-
-# Filter data based on selected majors
-filtered_data = data[data['Major_category'].isin(selected_majors)]
+major_categories = aggregates.categories.index.tolist()  # already sorted
+selected_majors = st.multiselect('Select Major Categories', options=major_categories, default=major_categories[:5], max_selections=8, key = 'majors_category')
 
-# Calculate the total number of men and women for each selected major
-gender_data = filtered_data.groupby('Major_category').agg({
-    'Men': 'sum',
-    'Women': 'sum'
-}).reset_index()
+# Per-session running totals and chart for Section 1; a new dataset version starts them over
+if st.session_state.get('gender_totals') is None or st.session_state['gender_totals'].version != dataset.version:
+    st.session_state['gender_totals'] = IncrementalGenderTotals(dataset.version)
+    st.session_state['gender_figure'] = IncrementalGenderFigure()
 
-# Calculate the percentage of men and women in each major
-gender_data['Total'] = gender_data['Men'] + gender_data['Women']
-gender_data['Male_Percentage'] = gender_data['Men'] / gender_data['Total']
-gender_data['Female_Percentage'] = gender_data['Women'] / gender_data['Total']
+# Add/drop only the categories whose selection changed (men/women totals and percentages)
+with stage('Section 1', 'aggregate'):
+    gender_data, gender_changed = st.session_state['gender_totals'].update(aggregates, selected_majors)
 col1, col2 = st.columns([1, 1])  # Equal width columns
 
 # Add "None" option to the selectbox for drill-down
 select_options = ['None'] + gender_data['Major_category'].tolist()
 selected_category = col2.selectbox('Select a Major Category to Drill Down', select_options)
 
-# Adjust opacity for the original graph
-opacity_values = [1.0] * len(gender_data)  # Default to full opacity for all bars
-if selected_category and selected_category != 'None':
-    opacity_values = [1.0 if cat == selected_category else 0.2 for cat in gender_data['Major_category']]
-
-
-# Create the normalized stacked bar chart
-fig = go.Figure()
-
-# Function to set text color with adjusted opacity
-def get_text_color(opacity):
-    return f'rgba(0, 0, 0, {opacity})'
-
-
-# Bar for Male Percentage
-fig.add_trace(go.Bar(
-    x=gender_data['Major_category'],
-    y=gender_data['Male_Percentage'],
-    name='Male',
-    marker=dict(color='#1f77b4', opacity=opacity_values),
-    text=gender_data['Male_Percentage'].apply(lambda x: f'{x:.1%}'),
-    textposition='auto',
-    hovertemplate = 'Count: %{customdata}<extra></extra>',
-    customdata = gender_data['Men'],
-    hoverlabel=dict(namelength=0)
-
-))
-
-# Bar for Female Percentage
-fig.add_trace(go.Bar(
-    x=gender_data['Major_category'],
-    y=gender_data['Female_Percentage'],
-    name='Female',
-    marker=dict(color='pink', opacity=opacity_values),
-    text=gender_data['Female_Percentage'].apply(lambda x: f'{x:.1%}'),
-    textposition='auto',
-    hovertemplate='Count: %{customdata}<extra></extra>',
-    customdata=gender_data['Women'],
-    hoverlabel=dict(namelength=0)
-
-))
-
-# Center the title and legend in the main chart
-fig.update_layout(
-    title={
-        'text': 'Gender Distribution by Major Category',
-        'x': 0.5,  # Center the title
-        'xanchor': 'center',
-        'yanchor': 'top'
-    },
-    legend=dict(
-        orientation="v",
-        yanchor="middle",
-        y=0.5,
-        xanchor="right",
-        x=1.15  # Center the legend
-    ),
-    xaxis_title='Major Category',
-    yaxis_title='Percentage',
-    yaxis=dict(range=[0, 1], tickformat=".0%"),
-    barmode='stack'
-)
+# Patch the normalized stacked bar chart with whatever changed since the last rerun
+with stage('Section 1', 'figure'):
+    fig = st.session_state['gender_figure'].update(gender_data, selected_category, gender_changed)
+    if compact_enabled():
+        fig = compact_figure(fig)
 
 
 # Display the chart
 with col1:
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, 'Section 1', 'render', 'gender')
 
 # selected_category = col2.selectbox('Select a major category to drill down on:', gender_data['Major_category'])
 
 
 with col2:    # If a category is selected, display the drill-down chart in the second column
     if selected_category and selected_category != 'None':
-        # Filter data based on the selected Major_category
-        major_filtered_data = data[data['Major_category'] == selected_category]
-
-        # Aggregate the total number of men and women for each major in the selected category
-        major_gender_data = major_filtered_data.groupby('Major').agg({
-            'Men': 'sum',
-            'Women': 'sum'
-        }).reset_index()
-
-
-        def wrap_and_truncate_label(label, width=15, max_lines=2):
-            wrapped = textwrap.wrap(label, width)
-            if len(wrapped) > max_lines:
-                wrapped = wrapped[:max_lines]  # Limit to max_lines
-                wrapped[-1] += "..."  # Add ellipsis to indicate truncation
-            return "<br>".join(wrapped)
-
-        # Calculate the percentage of men and women in each major
-        major_gender_data['Total'] = major_gender_data['Men'] + major_gender_data['Women']
-        major_gender_data['Male_Percentage'] = major_gender_data['Men'] / major_gender_data['Total']
-        major_gender_data['Female_Percentage'] = major_gender_data['Women'] / major_gender_data['Total']
-        major_gender_data['Short_Major'] = major_gender_data['Major'].apply(lambda x: wrap_and_truncate_label(x))
-
-
-
-
-        # Create the drill-down bar chart
-        drill_fig = go.Figure()
-
-        # Bar for Male Percentage in the selected major category
-        drill_fig.add_trace(go.Bar(
-            x=major_gender_data['Short_Major'],
-            y=major_gender_data['Male_Percentage'],
-            name='Male',
-            marker=dict(color='#1f77b4'),
-            hovertemplate='%{customdata[1]}<br>Male: %{y:.1%}<br>Count: %{customdata[0]}<extra></extra>',
-            customdata=list(zip(major_gender_data['Men'], major_gender_data['Major'])),
-            hoverlabel=dict(namelength=0)
-        ))
-
-        # Bar for Female Percentage in the selected major category
-        drill_fig.add_trace(go.Bar(
-            x=major_gender_data['Short_Major'],
-            y=major_gender_data['Female_Percentage'],
-            name='Female',
-            marker=dict(color='pink'),
-            hovertemplate='%{customdata[1]}<br>Female: %{y:.1%}<br>Count: %{customdata[0]}<extra></extra>',
-            customdata=list(zip(major_gender_data['Women'], major_gender_data['Major'])),
-            hoverlabel=dict(namelength=0)
-        ))
-
-        # Update layout for the drill-down stacked bar chart
-        drill_fig.update_layout(
-            title={
-                'text': f'Gender Distribution in {selected_category} majors',
-                'x': 0.5,  # Center the title
-                'xanchor': 'center',
-                'yanchor': 'top'
-            },
-            legend=dict(
-                orientation="v",
-                yanchor="middle",
-                y=0.5,
-                xanchor="right",
-                x=1.15  # Center the legend
-            ),
-            xaxis_title='Major',
-            yaxis_title='Percentage',
-            yaxis=dict(range=[0, 1], tickformat=".0%"),
-            xaxis=dict(
-                rangeslider=dict(
-                    visible=True,
-                    thickness=0.05,
-                    bgcolor="#E0E0E0",  # Set background color to gray
-                    borderwidth=0
-                ),
-                fixedrange=True,  # Allow zooming and scrolling
-                range=[-0.5,  min(len(major_filtered_data['Major'].unique()), 7.5)],
-                autorange=False,  # Disable auto-ranging to keep the range fixed
-
-            ),
-            barmode='stack',
-
-        )
+        # Build (or reuse) the drill-down chart from the precomputed per-major totals
+        with stage('Section 1', 'drill-down figure'):
+            drill_fig = drill_down_chart(dataset, aggregates, selected_category)
 
         # Display the drill-down chart in the second column
-        st.plotly_chart(drill_fig, use_container_width=True)
+        show_chart(drill_fig, 'Section 1', 'drill-down render', 'drill-down')
 
 ### END OF FIRST VISU ####
 
@@ -306,22 +233,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 ######### SECOND VISU #######################
 
-# Extract relevant columns for the chart
-filtered_data = data[['Major', 'Median', 'Major_category']]
-
-# Define the categories to keep based on size (top 7 by number of entries)
-categories_to_keep = [
-    'Engineering', 'Social Science', 'Physical Sciences',
-    'Agriculture & Natural Resources', 'Business', 'Law & Public Policy', 'Computers & Mathematics'
-]
-
-# Group all other categories into 'Other'
-filtered_data['Major_category_grouped'] = filtered_data['Major_category'].apply(
-    lambda x: x if x in categories_to_keep else 'Other'
-)
-
-# Calculate the height of the chart to fit all rows (25 pixels per row)
-chart_height = max(800, 25 * len(filtered_data)//10)
 st.markdown(
     """
     <style>
@@ -355,7 +266,9 @@ with col1:
     sort_field = st.radio(
         'Sort by:',
         options=['Salary', 'Salary and Major Category'],
-        index=0  # Default to 'Salary'
+        index=0,  # Default to 'Salary'
+        key='salary_sort_field',
+        disabled=client_side
     )
 
 # Determine sorting order based on the first radio button
@@ -367,7 +280,9 @@ with col2:
         sort_order = st.radio(
             'Order by:',
             options=['Descending', 'Ascending'],
-            index=1
+            index=1,
+            key='salary_sort_order',
+            disabled=client_side
         )
         ascending = True if sort_order == 'Ascending' else False
     # else:
@@ -395,79 +310,43 @@ with col2:
 # Checkbox to enable or disable color coding by Major Category
 with col3:
     st.markdown("<div style='height: 45px;'></div>", unsafe_allow_html=True)  # Add vertical space
-    color_by_category = st.checkbox('Color Code by Major Category', value=True)  # Default to not checked
-
-# Set the column for color coding based on the checkbox value
-color_arg = 'Major_category_grouped' if color_by_category else None
-
-# Sort the filtered data based on the user's selection
-if sort_field == 'Salary':
-    sorted_data = filtered_data.sort_values(by='Median', ascending=ascending)
-else:
-    sorted_data = filtered_data.sort_values(by=['Major_category_grouped','Median'], ascending=[True, ascending])
-
-# Define the color mapping, including the grouped 'Other' category
-color_discrete_map = {
-    'Engineering': 'blue',
-    'Business': 'red',
-    'Law & Public Policy': 'orange',
-    'Computers & Mathematics': 'purple',
-    'Agriculture & Natural Resources': 'green',
-    'Social Science': 'pink',
-    'Physical Sciences': 'yellow',
-    'Other': 'turquoise'  # Assign a color to the 'Other' category
-}
-
-# Recreate the horizontal bar chart with sorted data
-fig = px.bar(
-    sorted_data,
-    x='Median',
-    y='Major',
-    color=color_arg,  # Conditionally apply color coding
-    color_discrete_map=color_discrete_map if color_by_category else None,  # Use the fixed color mapping if applicable
-    orientation='h',
-    title='Median Salaries by Major',
-    labels={'Median': 'Median Salary (per thousand dollars)', 'Major': 'Academic Major', 'Major_category_grouped': 'Major Category'},
-    height=chart_height,
-    custom_data=['Major_category'],  # Include the original category in custom data,
-
-)
-
-fig.update_traces(
-    hovertemplate='<b>Major:</b> %{y}<br><b>Median Salary:</b> %{x}<br>' +
-                  '<b>Major Category:</b> %{customdata[0]}<extra></extra>',
-)
+    color_by_category = st.checkbox('Color Code by Major Category', value=True, key='salary_color',
+                                    disabled=client_side)  # Default to not checked
+    show_iqr = st.checkbox('Show 25th-75th percentile range', value=False, key='salary_iqr', disabled=client_side)
+    if not large_salary_data:
+        st.checkbox('Sort and color in the browser', value=False, key='salary_client_side',
+                    help='Sends every sort order with the chart; the buttons above it re-sort and recolor without a rerun')
+
+# Large datasets get a bounded view instead of one bar per major
+salary_view, salary_view_arg = 'All', None
+if large_salary_data:
+    view_col, arg_col = st.columns([1, 2])
+    with view_col:
+        salary_view = st.radio(
+            'Show:',
+            options=['Top / Bottom', 'Pages', 'Summary'],
+            index=0,
+            horizontal=True,
+            key='salary_view'
+        )
+    with arg_col:
+        if salary_view == 'Top / Bottom':
+            salary_view_arg = st.slider('Majors at each end', min_value=5, max_value=100, value=25, key='salary_extremes')
+        elif salary_view == 'Pages':
+            salary_view_arg = st.slider('Page', min_value=1, max_value=salary_page_count(aggregates.salaries), value=1,
+                                        key='salary_page') - 1
+
+
+# Pick up the figure started before Section 1 (or build it now if the inputs turned out different)
+salary_inputs = (sort_field, ascending, color_by_category, salary_view, salary_view_arg,
+                 salary_view != 'Summary' and show_iqr)
+if client_side:
+    salary_inputs = CLIENT_SIDE_SALARY_INPUTS
+with stage('Section 2', 'figure'):
+    fig = salary_future.result() if salary_inputs == expected_salary_inputs else get_salary_figure(salary_inputs)
 
-fig.update_layout(title={'text': 'Median Salaries by Major', 'x': 0.5, 'xanchor': 'center'},
-                  legend=dict(
-                      orientation='v',
-                      yanchor='top',
-                      y=1,
-                      xanchor='left',
-                      x=1.05,
-                      font=dict(size=14),
-                      traceorder='reversed',
-                      title=dict(text='Major Categories', font=dict(size=16, color='black', family='Arial')),),
-
-                  xaxis=dict(
-                      showgrid=True,  # Show vertical grid lines
-                      gridcolor='darkgray',  # Set the color of the grid lines
-                      gridwidth=1,  # Set the width of the grid lines
-                      range=[0, 115000]  # Limit the x-axis range to 0 to 100
-
-                  ),
-                  plot_bgcolor='white',  # Set the background color of the plot area
-
-                  )  # Center the title
-
-
-# Update layout to enforce sorting if sorted by Median (Salary)
-if sort_field == 'Salary':
-    fig.update_layout(
-        yaxis=dict(categoryorder='total ascending' if ascending else 'total descending'),
-    )
 # Display the updated bar chart
-st.plotly_chart(fig, use_container_width=True)
+show_chart(fig, 'Section 2', 'render', 'salary')
 
 ########## END OF SECOND VISU ##################
 
@@ -476,12 +355,6 @@ st.markdown("<hr style='border: 0.5px solid #ddd;'>", unsafe_allow_html=True)
 
 ########## THIRD VISU ##################
 
-
-#data = pd.read_csv(r'/Users/rubenchocron/Documents/Data Science BSC/year3/recent-grads (1).csv')
-data_url = "https://raw.githubusercontent.com/rubychoc/datavisu/main/recent-grads.csv"
-
-# Load the data directly from the GitHub URL
-data = pd.read_csv(data_url)
 st.markdown("""
     <div style="font-size:30px; font-weight: bold; margin-top: 30px; margin-bottom: 10px;">
     Section 3: Understanding Employment Distribution Across Major Categories
@@ -499,64 +372,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 st.markdown("<br>", unsafe_allow_html=True)
 
-# Group data by Major Category and sum the job counts
-grouped_data = data.groupby('Major_category').agg({
-    'College_jobs': 'sum',
-    'Non_college_jobs': 'sum',
-    'Low_wage_jobs': 'sum'
-}).reset_index()
-
-grouped_data = grouped_data[grouped_data['Major_category'] != 'Interdisciplinary']
-
-# Create the figure
-fig = go.Figure()
-
-# Add bars for each job type
-fig.add_trace(go.Bar(
-    x=grouped_data['Major_category'],
-    y=grouped_data['College_jobs'],
-    name='College Jobs',
-    marker=dict(color='darkgray'),
-    hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
-
-))
-
-fig.add_trace(go.Bar(
-    x=grouped_data['Major_category'],
-    y=grouped_data['Non_college_jobs'],
-    name='Non-College Jobs',
-    marker=dict(color='rgba(26, 118, 255, 0.7)'),
-    hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
-
-))
-
-fig.add_trace(go.Bar(
-    x=grouped_data['Major_category'],
-    y=grouped_data['Low_wage_jobs'],
-    name='Low Wage Service Jobs',
-    marker=dict(color='orange'),
-    hovertemplate='<b>Count:</b> %{y}<extra></extra>'  # Show only the count
-
-))
-
-# Update layout for better visibility and styling
-fig.update_layout(
-    title={
-        'text': 'Employment Types by Major Category: College, Non-College, and Service Jobs',
-        'x': 0.5,  # Center the title horizontally
-        'xanchor': 'center'  # Align the title to the center
-    },
-    xaxis_title='Major Category',
-    yaxis_title='Number of Jobs',
-    barmode='group',  # Group bars side by side
-    template='plotly_white'
-)
+# Pick up the figure started before Section 1
+with stage('Section 3', 'figure'):
+    fig = jobs_future.result()
 
 # Display the figure in Streamlit
-st.plotly_chart(fig, use_container_width=True)
+show_chart(fig, 'Section 3', 'render', 'jobs')
 
 ########## END OF THIRD VISU ##################
 
+# Debug timings panel (DATAVISU_PROFILE=1) and JSONL log (DATAVISU_PROFILE_LOG)
+finish_run(profile_run)
+
 
 
 
@@ -0,0 +1,35 @@
+"""Convert a grads CSV into the columnar file the dashboard memory-maps.
+
+    python ingest.py [CSV] [--out PATH]
+
+Writes an uncompressed Feather (Arrow IPC) file, next to the CSV by default,
+in data_loader's compact schema (Major_category/Major dictionary-encoded,
+narrowed counts, float32 rates). data_loader picks it up
+automatically while it holds the CSV's current content.
+"""
+import argparse
+import os
+
+from data_loader import LOCAL_DATA_PATH, columnar_path, write_columnar
+
+
+def ingest(csv_path=LOCAL_DATA_PATH, out_path=None):
+    out_path = out_path or columnar_path(csv_path)
+    # The mtime from before the read: if the CSV changes meanwhile, the next load hashes it
+    mtime_ns = os.stat(csv_path).st_mtime_ns
+    with open(csv_path, 'rb') as f:
+        return write_columnar(f.read(), out_path, source_mtime_ns=mtime_ns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='?', default=LOCAL_DATA_PATH)
+    parser.add_argument('--out', help='where to write the columnar file (default: next to the CSV)')
+    args = parser.parse_args(argv)
+
+    out_path = ingest(args.csv, args.out)
+    print(f'Wrote {out_path} ({os.path.getsize(out_path):,} bytes)')
+
+
+if __name__ == '__main__':
+    main()
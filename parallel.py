@@ -0,0 +1,30 @@
+import contextvars
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared by every session in the process. Threads rather than processes: the heavy
+# parts (pandas/numpy) release the GIL, and the results are figures that go into
+# figure_cache as they are, with no pickling between processes.
+_executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 1), thread_name_prefix='datavisu')
+
+
+# Imported by both worker tasks and the submitting thread: plotly.express (on a worker) and
+# figure serialization (st.plotly_chart) each import PIL.Image lazily, and two threads importing
+# it at once can fail with a partially initialized module. Loaded once, before the first task.
+_SHARED_IMPORTS = ['PIL.Image']
+_imports_done = threading.Event()
+
+
+def _import_shared():
+    if not _imports_done.is_set():
+        for name in _SHARED_IMPORTS:
+            importlib.import_module(name)
+        _imports_done.set()
+
+
+def submit(func, *args, **kwargs):
+    # Runs in a copy of the caller's context, so profiling stages still land in the caller's rerun
+    _import_shared()
+    return _executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
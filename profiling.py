@@ -0,0 +1,152 @@
+"""Per-section, per-stage timing for dashboard reruns.
+
+Wrap each stage of a section in ``stage('Section 1', 'figure')`` (or decorate
+a function with ``timed(...)``). Timings are collected for the current rerun
+and, at the end of the script, shown in a sidebar panel when DATAVISU_PROFILE=1
+and appended as JSON lines to DATAVISU_PROFILE_LOG when that is set. Chart
+payload sizes recorded with ``record_payload`` are reported alongside.
+
+    python profiling.py LOG.jsonl    # p50/p95 per section and stage
+"""
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+PANEL_ENV = 'DATAVISU_PROFILE'
+LOG_ENV = 'DATAVISU_PROFILE_LOG'
+
+_current_run = contextvars.ContextVar('datavisu_profile_run', default=None)
+_log_lock = threading.Lock()
+
+
+class Run:
+    # Timings recorded during one script rerun
+
+    def __init__(self, session=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session = session
+        self.started = time.time()
+        self.records = []
+        self.payloads = []
+        self._lock = threading.Lock()
+
+    def add(self, section, name, ms):
+        with self._lock:
+            self.records.append({'section': section, 'stage': name, 'ms': ms})
+
+    def add_payload(self, section, chart, nbytes):
+        with self._lock:
+            self.payloads.append({'section': section, 'chart': chart, 'bytes': nbytes})
+
+    def section_totals(self):
+        totals = {}
+        for record in self.records:
+            totals[record['section']] = totals.get(record['section'], 0.0) + record['ms']
+        return totals
+
+
+def start_run(session=None):
+    run = Run(session)
+    _current_run.set(run)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def stage(section, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run = _current_run.get()
+        if run is not None:
+            run.add(section, name, (time.perf_counter() - start) * 1000)
+
+
+def timed(section, name=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(section, name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_payload(section, chart, nbytes):
+    run = _current_run.get()
+    if run is not None:
+        run.add_payload(section, chart, nbytes)
+
+
+def panel_enabled():
+    return os.environ.get(PANEL_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def enabled():
+    # Whether anything reads this run's measurements (the panel or the log)
+    return panel_enabled() or bool(os.environ.get(LOG_ENV))
+
+
+def write_log(run, path=None):
+    path = path or os.environ.get(LOG_ENV)
+    if not path or not (run.records or run.payloads):
+        return
+    lines = [
+        json.dumps({'ts': run.started, 'run': run.run_id, 'session': run.session, **record})
+        for record in run.records + run.payloads
+    ]
+    with _log_lock, open(path, 'a') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def render_panel(run):
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar:
+        st.subheader('Render timings')
+        timings = pd.DataFrame(run.records, columns=['section', 'stage', 'ms'])
+        st.dataframe(timings.style.format({'ms': '{:.1f}'}), hide_index=True)
+        st.caption(' · '.join(f'{section}: {ms:.0f} ms' for section, ms in run.section_totals().items()))
+        if run.payloads:
+            st.subheader('Chart payloads')
+            payloads = pd.DataFrame(run.payloads, columns=['section', 'chart', 'bytes'])
+            st.dataframe(payloads.style.format({'bytes': '{:,}'}), hide_index=True)
+
+
+def finish_run(run):
+    # Call once at the end of the script
+    write_log(run)
+    if panel_enabled():
+        render_panel(run)
+
+
+def summarize(path):
+    # p50/p95 (ms) per section and stage, over every rerun in a JSONL log
+    import pandas as pd
+
+    log = pd.read_json(path, lines=True)
+    if 'ms' in log:
+        log = log[log['ms'].notna()]
+    grouped = log.groupby(['section', 'stage'], sort=False)['ms']
+    return pd.DataFrame({
+        'runs': grouped.size(),
+        'p50': grouped.quantile(0.5),
+        'p95': grouped.quantile(0.95),
+    }).round(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    print(summarize(sys.argv[1]).to_string())
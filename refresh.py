@@ -0,0 +1,247 @@
+"""Background data refresh: watch the data source and hot-swap new data.
+
+With DATAVISU_REFRESH=<seconds>, a background thread checks the dashboard's
+source (DATAVISU_DATA or the bundled CSV) every that many seconds, and reruns
+read the current snapshot -- dataset plus rollups -- without touching the
+file or the network. A check is cheap:
+
+    local file   compare mtime and size; only when they moved, hash the content
+    http(s) URL  conditional GET (If-None-Match / If-Modified-Since) against a
+                 local mirror of the last download, kept with its ETag in
+                 DATAVISU_MIRROR_DIR (default ~/.cache/datavisu/mirrors)
+
+Only new content is re-ingested. The new dataset, its rollups and the common
+charts (warm_cache.py's states) are built on the refresh thread, then swapped
+in with one assignment: reruns already under way finish on the old snapshot,
+new reruns get the new one, and nobody waits for the rebuild. A failed check
+or rebuild keeps the current snapshot (see last_error) and is retried next time.
+
+    python refresh.py [SOURCE] [--interval SECONDS] [--once]
+
+runs the same loop in the foreground (e.g. next to the workers, with
+DATAVISU_CACHE set, so they find every refreshed result in the shared cache).
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+
+from aggregates import DASHBOARD_COLUMNS, get_aggregates
+from data_loader import LOCAL_DATA_PATH, STREAM_VERSION_SUFFIX, file_hash, is_url, load_dataset, resolve_source
+from warm_cache import warm
+
+REFRESH_ENV = 'DATAVISU_REFRESH'
+MIRROR_DIR_ENV = 'DATAVISU_MIRROR_DIR'
+DEFAULT_MIRROR_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'datavisu', 'mirrors')
+
+# dataset:    the Dataset being served
+# aggregates: its rollups
+# checked:    time.time() of the last check that found the source unchanged or loaded it
+Snapshot = namedtuple('Snapshot', ['dataset', 'aggregates', 'checked'])
+
+
+def refresh_interval():
+    # Seconds between checks, or None when background refresh is off
+    value = os.environ.get(REFRESH_ENV)
+    return float(value) if value else None
+
+
+def mirror_dir():
+    return os.environ.get(MIRROR_DIR_ENV) or DEFAULT_MIRROR_DIR
+
+
+def _content_hash(dataset):
+    return dataset.version.removesuffix(STREAM_VERSION_SUFFIX)
+
+
+class UrlMirror:
+    # The last download of a URL as a local file, plus the validators to revalidate it
+
+    def __init__(self, url, directory=None):
+        self.url = url
+        name = hashlib.sha1(url.encode()).hexdigest()[:16]
+        directory = directory or mirror_dir()
+        self.path = os.path.join(directory, name + '.csv')
+        self._meta_path = os.path.join(directory, name + '.json')
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path, data, mode):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def fetch(self):
+        # Revalidate the mirror and return the content hash of what it now holds.
+        # A 304 costs no download; a 200 with the same bytes (a server without
+        # validators) leaves the file alone.
+        meta = self._read_meta() if self.exists() else {}
+        request = urllib.request.Request(self.url)
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                raw = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and meta.get('sha1'):
+                return meta['sha1']
+            raise
+        digest = hashlib.sha1(raw).hexdigest()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if digest != meta.get('sha1'):
+            self._write(self.path, raw, 'wb')
+        self._write(self._meta_path, json.dumps({'etag': headers.get('ETag'), 'sha1': digest,
+                                                 'last_modified': headers.get('Last-Modified')}), 'w')
+        return digest
+
+
+class DataRefresher:
+    # Serves the current Snapshot of one source and replaces it when the source changes
+
+    def __init__(self, source=None, columns=DASHBOARD_COLUMNS, warm_charts=True):
+        self.source = resolve_source(source)
+        self.columns = columns
+        self.warm_charts = warm_charts
+        self.mirror = UrlMirror(self.source) if is_url(self.source) else None
+        self.last_error = None
+        self.swaps = 0
+        self._signature = None  # (mtime_ns, size) of the file last checked
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._snapshot = self._initial_snapshot()
+
+    def _local_path(self):
+        return self.mirror.path if self.mirror else self.source
+
+    def _stat_signature(self):
+        stat = os.stat(self._local_path())
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        dataset = load_dataset(self._local_path(), self.columns, fallback=False)
+        if self.mirror:
+            dataset = dataset._replace(source=self.source)
+        return dataset
+
+    def _initial_snapshot(self):
+        # Serve what is on disk right away (for a URL: the mirror, fetched first if there is none)
+        try:
+            if self.mirror and not self.mirror.exists():
+                self.mirror.fetch()
+            self._signature = self._stat_signature()
+            dataset = self._load()
+        except OSError as error:
+            # Nothing to serve yet: the bundled snapshot, until a check succeeds
+            self.last_error = error
+            dataset = load_dataset(LOCAL_DATA_PATH, self.columns)
+        return Snapshot(dataset=dataset, aggregates=get_aggregates(dataset), checked=time.time())
+
+    def current(self):
+        return self._snapshot
+
+    def _changed(self):
+        # True when the source's content differs from the snapshot's
+        known_hash = _content_hash(self._snapshot.dataset)
+        if self.mirror:
+            return self.mirror.fetch() != known_hash
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return file_hash(self.source) != known_hash
+
+    def refresh(self):
+        # One check, and a rebuild and swap if needed; returns True when new data was swapped in
+        with self._refresh_lock:
+            try:
+                on_fallback = self._snapshot.dataset.source != self.source
+                if not self._changed() and not on_fallback:
+                    self._snapshot = self._snapshot._replace(checked=time.time())
+                    self.last_error = None
+                    return False
+                dataset = self._load()
+                aggregates = get_aggregates(dataset)
+                if self.warm_charts:
+                    warm(dataset)
+            except (OSError, ValueError) as error:
+                # Hash the file again next time, even if its stat hasn't moved since
+                self._signature = None
+                self.last_error = error
+                return False
+            self._snapshot = Snapshot(dataset=dataset, aggregates=aggregates, checked=time.time())
+            self.last_error = None
+            self.swaps += 1
+            return True
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.refresh()
+
+    def start(self, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='datavisu-refresh',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+# One refresher per (source, columns), shared by every session in the process
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+def get_refresher(source=None, columns=DASHBOARD_COLUMNS):
+    key = (resolve_source(source), tuple(columns) if columns else None)
+    with _refreshers_lock:
+        refresher = _refreshers.get(key)
+        if refresher is None:
+            refresher = _refreshers[key] = DataRefresher(source, columns)
+            interval = refresh_interval()
+            if interval:
+                refresher.start(interval)
+        return refresher
+
+
+def _describe(snapshot):
+    dataset = snapshot.dataset
+    return f'{dataset.version[:12]}  {len(dataset.frame):,} rows  from {dataset.source}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', nargs='?')
+    parser.add_argument('--interval', type=float, default=refresh_interval() or 60)
+    parser.add_argument('--once', action='store_true', help='check once and exit')
+    args = parser.parse_args()
+
+    refresher = DataRefresher(args.source)
+    print('serving', _describe(refresher.current()))
+    while True:
+        if refresher.refresh():
+            print('swapped in', _describe(refresher.current()))
+        elif refresher.last_error is not None:
+            print('check failed:', refresher.last_error)
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,173 @@
+"""Registry of dataset partitions: a directory of extracts sharing the grads schema.
+
+    python registry.py DIR    # list the partitions and what they contain
+
+Every CSV in the directory (e.g. one per year or region, like all-ages.csv,
+grad-students.csv, women-stem.csv) is a partition. The index records each
+one's row count, columns and content hash, and is kept in DIR/datavisu-index.json
+so that later processes only re-read files that changed. Partitions are
+loaded only when selected, each through data_loader (so each is cached on its
+own and can use its columnar copy); a selection of several is concatenated.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+from data_loader import CATEGORY, SCHEMA, Dataset, load_dataset
+from streaming import HashingReader
+
+# Point the dashboard at a directory of partitions instead of a single file
+DATA_DIR_ENV = 'DATAVISU_DATA_DIR'
+
+INDEX_FILENAME = 'datavisu-index.json'
+PARTITION_SUFFIX = '.csv'
+
+# name:    file name without the extension, shown in the selector
+# rows:    data rows (header and blank lines excluded), as the CSV parser splits them
+# columns: the file's columns, in file order
+# version: content hash, as data_loader computes it for the same file
+Partition = namedtuple('Partition', ['name', 'path', 'rows', 'columns', 'version', 'mtime_ns', 'size'])
+
+# Combined selections for the last few partition sets: (versions, columns) -> Dataset
+_MAX_SELECTIONS = 4
+
+
+def data_dir():
+    return os.environ.get(DATA_DIR_ENV)
+
+
+def _index_partition(path, stat):
+    # One streamed pass: the content hash of the bytes, the header and row count from the CSV
+    # parser (so quoted newlines and blank lines don't count as rows), the file never held whole
+    with open(path, 'rb') as f:
+        reader = HashingReader(f)
+        rows = csv.reader(io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8-sig', newline=''))
+        columns = next(rows, [])
+        count = sum(1 for row in rows if row)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return Partition(name=name, path=path, rows=count, columns=columns, version=reader.sha1.hexdigest(),
+                     mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+
+class DatasetRegistry:
+    # Index of the partitions in one directory, refreshed from file stats on every
+    # call (only new or changed files are read), plus the combined selections
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.index_path = os.path.join(self.directory, INDEX_FILENAME)
+        self._partitions = self._read_index()
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read_index(self):
+        # An unreadable index, or one whose entries don't match Partition (written by another
+        # version, or edited by hand), is rebuilt from the files
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+            return {entry['name']: Partition(**entry) for entry in entries}
+        except (OSError, ValueError, TypeError, KeyError):
+            return {}
+
+    def _write_index(self):
+        # Best effort: a read-only directory just means re-indexing in the next process
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump([p._asdict() for p in self._partitions.values()], f, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def refresh(self):
+        partitions, changed = {}, False
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(PARTITION_SUFFIX):
+                continue
+            path = os.path.join(self.directory, filename)
+            stat = os.stat(path)
+            name = os.path.splitext(filename)[0]
+            partition = self._partitions.get(name)
+            if partition is None or (partition.path, partition.mtime_ns, partition.size) != (
+                    path, stat.st_mtime_ns, stat.st_size):
+                partition = _index_partition(path, stat)
+                changed = True
+            partitions[name] = partition
+        changed = changed or partitions.keys() != self._partitions.keys()
+        self._partitions = partitions
+        if changed:
+            self._write_index()
+        return partitions
+
+    def partitions(self, columns=None):
+        # The partitions that have all of `columns` (every partition when None)
+        with self._lock:
+            partitions = self.refresh()
+        return [p for p in partitions.values() if not columns or set(columns) <= set(p.columns)]
+
+    def load(self, names, columns=None):
+        # One partition is returned as data_loader loads it; several are concatenated
+        # (category columns unioned, so they stay categorical)
+        with self._lock:
+            selected = [self.refresh()[name] for name in names]
+        datasets = [load_dataset(p.path, columns, fallback=False) for p in selected]
+        if len(datasets) == 1:
+            return datasets[0]
+
+        key = (tuple(d.version for d in datasets), tuple(columns) if columns else None)
+        with self._lock:
+            dataset = self._selections.get(key)
+            if dataset is not None:
+                self._selections.move_to_end(key)
+                return dataset
+        dataset = combine_datasets(datasets)
+        with self._lock:
+            self._selections[key] = dataset
+            if len(self._selections) > _MAX_SELECTIONS:
+                self._selections.popitem(last=False)
+        return dataset
+
+
+def combine_datasets(datasets):
+    frames = [d.frame for d in datasets]
+    columns = [c for c in frames[0].columns if all(c in frame for frame in frames)]
+    combined = {}
+    for column in columns:
+        if SCHEMA.get(column) == CATEGORY:
+            parts = [frame[column] for frame in frames]
+            combined[column] = pd.api.types.union_categoricals(parts, sort_categories=True)
+        else:
+            combined[column] = pd.concat([frame[column] for frame in frames], ignore_index=True)
+    version = hashlib.sha1('+'.join(d.version for d in datasets).encode()).hexdigest()
+    return Dataset(frame=pd.DataFrame(combined, columns=columns), version=version,
+                   source=os.pathsep.join(d.source for d in datasets))
+
+
+# One registry per directory, shared by every session in the process
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(directory=None):
+    directory = os.path.abspath(directory or data_dir())
+    with _registries_lock:
+        registry = _registries.get(directory)
+        if registry is None:
+            registry = _registries[directory] = DatasetRegistry(directory)
+        return registry
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    for partition in get_registry(sys.argv[1]).partitions():
+        print(f'{partition.name:<24} {partition.rows:>8,} rows  {len(partition.columns):>3} columns  '
+              f'{partition.version[:12]}')
@@ -0,0 +1,235 @@
+"""Result cache shared across sessions, processes and hosts.
+
+Rollups and serialized figures are stored under their dataset version plus
+the widget state that produced them, so a result computed once -- by any
+worker, or ahead of time by warm_cache.py -- is reused everywhere. Configure
+with DATAVISU_CACHE:
+
+    disk              files under the default directory (~/.cache/datavisu)
+    disk:/some/dir    files under /some/dir
+    redis://host:6379/0 (or rediss://)  any Redis-protocol server (needs the redis package)
+
+Entries expire after DATAVISU_CACHE_TTL seconds (default one day) and the
+oldest are evicted once the cache holds more than DATAVISU_CACHE_MAX_MB
+megabytes (default 512). Keys also hash the source of the modules that shape
+the results, so a deploy with different chart code never reads old entries.
+Backend errors, and entries that don't decode (truncated or corrupt), are
+treated as misses and rebuilt: the dashboard only gets slower.
+
+Entries are data only -- figures as plotly JSON, tables as Arrow IPC streams --
+and never pickles, so whoever can write to the cache can at worst change what
+a chart shows, not run code in the workers.
+"""
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow comes with streamlit; without it only figures are shared
+    pa = None
+
+try:
+    import redis
+except ImportError:  # only needed for the Redis backend
+    redis = None
+
+CACHE_ENV = 'DATAVISU_CACHE'
+TTL_ENV = 'DATAVISU_CACHE_TTL'
+MAX_MB_ENV = 'DATAVISU_CACHE_MAX_MB'
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_MB = 512
+DEFAULT_DISK_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'datavisu')
+
+# Modules whose code decides what a cached result looks like
+_CODE_MODULES = ['aggregates.py', 'charts.py', 'figures.py', 'sketches.py', 'streaming.py', 'transforms.py']
+
+
+def _code_version():
+    digest = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _CODE_MODULES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class DiskBackend:
+    # One file per entry; TTL from the file's mtime, eviction oldest-written first
+
+    errors = (OSError,)
+
+    def __init__(self, directory=DEFAULT_DISK_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_MB << 20):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.bin')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.bin'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.bin'):
+                os.remove(entry.path)
+
+
+class RedisBackend:
+    # TTL through SET EX. For the size bound every write is also recorded in a
+    # sorted set (by write time) and a running byte count; past max_bytes the
+    # oldest entries are deleted. Setting the server's own maxmemory-policy to
+    # allkeys-lru works as well.
+
+    def __init__(self, url, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_MB << 20, prefix='datavisu'):
+        if redis is None:
+            raise RuntimeError('the Redis cache backend needs the redis package (pip install redis)')
+        self.errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self._index = f'{prefix}:index'
+        self._sizes = f'{prefix}:sizes'
+        self._bytes = f'{prefix}:bytes'
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get(self, key):
+        return self.client.get(self._key(key))
+
+    def set(self, key, value):
+        key = self._key(key)
+        with self.client.pipeline() as pipe:
+            pipe.hget(self._sizes, key)
+            pipe.set(key, value, ex=self.ttl)
+            pipe.zadd(self._index, {key: time.time()})
+            pipe.hset(self._sizes, key, len(value))
+            previous = pipe.execute()[0]
+        total = self.client.incrby(self._bytes, len(value) - int(previous or 0))
+        while total > self.max_bytes:
+            oldest = self.client.zpopmin(self._index)
+            if not oldest:
+                break
+            oldest_key = oldest[0][0]
+            with self.client.pipeline() as pipe:
+                pipe.hget(self._sizes, oldest_key)
+                pipe.hdel(self._sizes, oldest_key)
+                pipe.delete(oldest_key)
+                size = pipe.execute()[0]
+            total = self.client.decrby(self._bytes, int(size or 0))
+
+    def clear(self):
+        keys = self.client.zrange(self._index, 0, -1)
+        self.client.delete(self._index, self._sizes, self._bytes, *keys)
+
+
+class ResultCache:
+    # Key tuples in, bytes to the backend; any backend error is a miss
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.code_version = _code_version()
+
+    def _key(self, key):
+        return hashlib.sha1(repr((self.code_version,) + tuple(key)).encode()).hexdigest()
+
+    def get_bytes(self, key):
+        try:
+            return self.backend.get(self._key(key))
+        except self.backend.errors:
+            return None
+
+    def set_bytes(self, key, value):
+        try:
+            self.backend.set(self._key(key), value)
+        except self.backend.errors:
+            pass
+
+
+# What decoding a truncated or corrupt entry raises (pyarrow's ArrowInvalid is a ValueError as well)
+DECODE_ERRORS = (ValueError,) if pa is None else (ValueError, pa.ArrowException)
+
+
+def frames_supported():
+    return pa is not None
+
+
+def frame_to_bytes(frame):
+    # Arrow IPC stream of the frame, index and dtypes (categoricals included) kept in its pandas metadata
+    table = pa.Table.from_pandas(frame)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def frame_from_bytes(raw):
+    return pa.ipc.open_stream(raw).read_all().to_pandas()
+
+
+def backend_from_env():
+    spec = os.environ.get(CACHE_ENV, '')
+    if not spec:
+        return None
+    ttl = int(os.environ.get(TTL_ENV, DEFAULT_TTL))
+    max_bytes = int(float(os.environ.get(MAX_MB_ENV, DEFAULT_MAX_MB)) * (1 << 20))
+    if spec.startswith(('redis://', 'rediss://')):
+        return RedisBackend(spec, ttl=ttl, max_bytes=max_bytes)
+    if spec == 'disk' or spec.startswith('disk:'):
+        return DiskBackend(spec[len('disk:'):] or DEFAULT_DISK_DIR, ttl=ttl, max_bytes=max_bytes)
+    raise ValueError(f'{CACHE_ENV} must be "disk", "disk:DIR" or a redis:// URL, not {spec!r}')
+
+
+# Process-wide, created on first use from the environment (None when disabled)
+_shared = None
+_shared_lock = threading.Lock()
+_configured = False
+
+
+def shared_cache():
+    global _shared, _configured
+    with _shared_lock:
+        if not _configured:
+            backend = backend_from_env()
+            _shared = backend and ResultCache(backend)
+            _configured = True
+        return _shared
@@ -0,0 +1,92 @@
+"""Mergeable quantile sketches (KLL) for salary statistics over many records.
+
+A QuantileSketch takes values in batches, merges with sketches built from
+other chunks, partitions or threads, and answers quantile queries from at
+most about 3k retained items however many values went in. With the default
+k=200 the rank error is about 1% (a P25 estimate lies between the true P24
+and P26), and quantiles are exact until a sketch first compacts, i.e. for
+the first k values.
+"""
+import math
+import random
+
+import numpy as np
+
+DEFAULT_K = 200
+
+# Each level's capacity shrinks by this factor going down from the top level
+_CAPACITY_DECAY = 2 / 3
+_MIN_CAPACITY = 8
+
+
+class QuantileSketch:
+    # levels[h] holds items that each stand for 2**h of the values seen
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(_MIN_CAPACITY, math.ceil(self.k * _CAPACITY_DECAY ** depth))
+
+    def _compress(self):
+        # Halve every level over capacity: sort it, keep every other item (from a random
+        # offset) at twice the weight one level up, and leave an odd one out where it is
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                kept = items[:len(items) % 2]
+                items = items[len(kept):]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[random.getrandbits(1)::2]])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        # Linear interpolation between ranks, like numpy/pandas' default, with each
+        # retained item covering a run of 2**level ranks
+        qs = np.asarray(qs, dtype='float64')
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        centers = np.cumsum(weights) - (weights + 1) / 2
+        return np.clip(np.interp(qs * (self.count - 1), centers, values), self.min, self.max)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def __len__(self):
+        return sum(len(items) for items in self.levels)
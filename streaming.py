@@ -0,0 +1,261 @@
+"""Streaming ingest for grads CSVs too large to load in one piece.
+
+Reads the CSV in chunks and folds each chunk into running accumulators, one
+slot per (Major_category, Major): Men/Women and job-type sums, and a quantile
+sketch (sketches.py) of the Median column, plus one sketch per Major_category.
+What comes out is a summary frame with one row per major and the dashboard's
+columns (Median, P25th and P75th from the sketches), so build_aggregates and
+every section work on it unchanged while memory stays bounded by the number of
+majors, not the number of rows.
+
+    python streaming.py CSV [CSV ...] [--chunksize N] [--workers N]
+
+prints the summary of one or more CSVs (partitions are merged) and the salary
+quartiles per category.
+"""
+import argparse
+import hashlib
+import io
+import urllib.request
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from data_loader import PARSE_DTYPES, SCHEMA, compact_counts, is_url
+from parallel import submit
+from sketches import DEFAULT_K, QuantileSketch
+
+# The columns the summary carries (what the three sections read)
+KEY_COLUMNS = ['Major_category', 'Major']
+SUM_COLUMNS = ['Men', 'Women', 'College_jobs', 'Non_college_jobs', 'Low_wage_jobs']
+SALARY_COLUMN = 'Median'
+QUARTILE_COLUMNS = ['P25th', 'P75th']
+STREAM_COLUMNS = KEY_COLUMNS + SUM_COLUMNS + [SALARY_COLUMN] + QUARTILE_COLUMNS
+
+DEFAULT_CHUNKSIZE = 500_000
+
+QUARTILES = [0.25, 0.5, 0.75]
+
+
+def _split_by(codes, values):
+    # (code, values with that code) for every code present, without a Python pass over the rows
+    order = np.argsort(codes, kind='stable')
+    codes, values = codes[order], values[order]
+    present, starts = np.unique(codes, return_index=True)
+    return zip(present, np.split(values, starts[1:]))
+
+
+class SummaryAccumulator:
+    # Running per-major totals and salary sketches; add() one chunk at a time,
+    # merge() accumulators built from other chunks or files, summary() at the end.
+    # A major's salaries are buffered as plain (slot, value) arrays until it has more
+    # than the sketch size, and only then get a sketch of their own: most majors
+    # never do, and their quantiles stay exact and vectorized.
+    # A major that only ever had one row keeps that row's own P25th/P75th, since a
+    # single Median has no spread to report.
+
+    def __init__(self):
+        self._ids = {}  # (Major_category, Major) -> slot, in order of first appearance
+        self._sums = np.zeros((0, len(SUM_COLUMNS)))
+        self._row_counts = np.zeros(0, dtype=np.int64)
+        self._row_quartiles = np.zeros((0, len(QUARTILE_COLUMNS)))
+        self._buffered_slots = np.zeros(0, dtype=np.int64)
+        self._buffered_salaries = np.zeros(0)
+        self._salary_sketches = {}  # slot -> QuantileSketch, for majors past the buffer
+        self._category_sketches = {}
+        self.rows = 0
+
+    def _slots(self, keys):
+        # Slots for these keys, growing the accumulators for keys not seen before
+        slots = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            slots[i] = self._ids.setdefault(key, len(self._ids))
+        grow = len(self._ids) - len(self._sums)
+        if grow:
+            self._sums = np.vstack([self._sums, np.zeros((grow, len(SUM_COLUMNS)))])
+            self._row_counts = np.append(self._row_counts, np.zeros(grow, dtype=np.int64))
+            self._row_quartiles = np.vstack([self._row_quartiles, np.full((grow, len(QUARTILE_COLUMNS)), np.nan)])
+        return slots
+
+    def _add_salaries(self, slots, salaries):
+        known = ~np.isnan(salaries)
+        slots, salaries = slots[known], salaries[known]
+        sketched = np.isin(slots, list(self._salary_sketches))
+        for slot, values in _split_by(slots[sketched], salaries[sketched]):
+            self._salary_sketches[slot].update(values)
+
+        slots = np.concatenate([self._buffered_slots, slots[~sketched]])
+        salaries = np.concatenate([self._buffered_salaries, salaries[~sketched]])
+        # Majors whose buffer outgrew a sketch move into one
+        full = np.flatnonzero(np.bincount(slots) > DEFAULT_K) if len(slots) else []
+        if len(full):
+            moving = np.isin(slots, full)
+            for slot, values in _split_by(slots[moving], salaries[moving]):
+                self._salary_sketches[slot] = QuantileSketch().update(values)
+            slots, salaries = slots[~moving], salaries[~moving]
+        self._buffered_slots, self._buffered_salaries = slots, salaries
+
+    def _category_sketch(self, category):
+        sketch = self._category_sketches.get(category)
+        if sketch is None:
+            sketch = self._category_sketches[category] = QuantileSketch()
+        return sketch
+
+    def add(self, chunk):
+        # Rows missing their Major or Major_category belong to no major (build_aggregates'
+        # groupby drops them too), but still count toward their category's salaries
+        keyed = chunk
+        if chunk[KEY_COLUMNS].isna().any(axis=None):
+            keyed = chunk[chunk[KEY_COLUMNS].notna().all(axis=1)]
+        grouped = keyed.groupby(KEY_COLUMNS, observed=True, sort=False)
+        sums = grouped[SUM_COLUMNS].sum()
+        slots = self._slots(list(sums.index))
+        self._sums[slots] += sums.to_numpy(dtype='float64')
+        self._row_counts[slots] += grouped.size().to_numpy()
+        self._row_quartiles[slots] = grouped[QUARTILE_COLUMNS].last().to_numpy(dtype='float64')
+
+        # ngroup numbers the groups in the same first-appearance order as `sums`
+        row_slots = slots[grouped.ngroup().to_numpy(dtype='int64')]
+        self._add_salaries(row_slots, keyed[SALARY_COLUMN].to_numpy(dtype='float64'))
+
+        salaries = chunk[SALARY_COLUMN].to_numpy(dtype='float64')
+        categories = chunk['Major_category'].astype('category')
+        for code, values in _split_by(categories.cat.codes.to_numpy(), salaries):
+            if code >= 0:
+                self._category_sketch(categories.cat.categories[code]).update(values)
+        self.rows += len(chunk)
+
+    def merge(self, other):
+        slots = self._slots(list(other._ids))
+        self._sums[slots] += other._sums
+        # Only read for majors with a single row overall, i.e. a row from one side
+        self._row_quartiles[slots] = np.where(self._row_counts[slots, None] > 0,
+                                              self._row_quartiles[slots], other._row_quartiles)
+        self._row_counts[slots] += other._row_counts
+        for slot, sketch in other._salary_sketches.items():
+            if slots[slot] in self._salary_sketches:
+                self._salary_sketches[slots[slot]].merge(sketch)
+            else:
+                self._salary_sketches[slots[slot]] = QuantileSketch().merge(sketch)
+        self._add_salaries(slots[other._buffered_slots], other._buffered_salaries)
+        for category, sketch in other._category_sketches.items():
+            self._category_sketch(category).merge(sketch)
+        self.rows += other.rows
+        return self
+
+    def salary_quantiles(self, qs=QUARTILES):
+        # slots x qs; buffered majors exactly (pandas' linear interpolation, like the sketch's)
+        quantiles = np.full((len(self._ids), len(qs)), np.nan)
+        if len(self._buffered_slots):
+            buffered = pd.Series(self._buffered_salaries).groupby(self._buffered_slots).quantile(qs).unstack()
+            quantiles[buffered.index.to_numpy()] = buffered.to_numpy()
+        for slot, sketch in self._salary_sketches.items():
+            quantiles[slot] = sketch.quantiles(qs)
+        return quantiles
+
+    def category_salaries(self):
+        # Salary quartiles over every record in each Major_category
+        categories = sorted(self._category_sketches)
+        sketches = [self._category_sketches[category] for category in categories]
+        quartiles = np.array([sketch.quantiles(QUARTILES) for sketch in sketches]).reshape(-1, len(QUARTILES))
+        return pd.DataFrame({
+            'P25th': quartiles[:, 0],
+            'Median': quartiles[:, 1],
+            'P75th': quartiles[:, 2],
+            'Records': [sketch.count for sketch in sketches],
+        }, index=pd.Index(categories, name='Major_category'))
+
+    def summary(self):
+        # One row per (Major_category, Major) in the dashboard's schema, in first-seen order
+        keys = list(self._ids)
+        frame = pd.DataFrame({
+            column: pd.Categorical([key[i] for key in keys], categories=sorted({key[i] for key in keys}))
+            for i, column in enumerate(KEY_COLUMNS)
+        })
+        for i, column in enumerate(SUM_COLUMNS):
+            frame[column] = compact_counts(pd.Series(self._sums[:, i]))
+
+        quartiles = self.salary_quantiles()
+        single_row = (self._row_counts == 1)[:, None] & ~np.isnan(self._row_quartiles)
+        quartiles[:, [0, 2]] = np.where(single_row, self._row_quartiles, quartiles[:, [0, 2]])
+        for column, values in zip(['P25th', SALARY_COLUMN, 'P75th'], quartiles.T):
+            frame[column] = compact_counts(pd.Series(values).round())
+        return frame[STREAM_COLUMNS]
+
+
+class HashingReader(io.RawIOBase):
+    # Passes a binary stream through while hashing it, so the summary gets the
+    # same content hash data_loader would compute, without a second read
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.sha1 = hashlib.sha1()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.sha1.update(data)
+        return len(data)
+
+
+def _open(source):
+    if is_url(source):
+        return urllib.request.urlopen(source, timeout=10)
+    return open(source, 'rb')
+
+
+def _accumulate(chunk):
+    accumulator = SummaryAccumulator()
+    accumulator.add(chunk)
+    return accumulator
+
+
+def stream_accumulator(source, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    # -> (SummaryAccumulator, content hash of the whole file). With workers > 1 the
+    # chunks are folded on the worker threads and merged in file order, with at most
+    # `workers` chunks in flight.
+    accumulator = SummaryAccumulator()
+    pending = deque()
+    with _open(source) as stream:
+        reader = HashingReader(stream)
+        chunks = pd.read_csv(io.BufferedReader(reader), usecols=STREAM_COLUMNS, chunksize=chunksize,
+                             dtype={column: PARSE_DTYPES[SCHEMA[column]] for column in STREAM_COLUMNS})
+        for chunk in chunks:
+            if workers <= 1:
+                accumulator.add(chunk)
+                continue
+            pending.append(submit(_accumulate, chunk))
+            if len(pending) >= workers:
+                accumulator.merge(pending.popleft().result())
+        while pending:
+            accumulator.merge(pending.popleft().result())
+        return accumulator, reader.sha1.hexdigest()
+
+
+def stream_summary(source, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    # -> (summary frame, content hash of the whole file)
+    accumulator, version = stream_accumulator(source, chunksize, workers)
+    return accumulator.summary(), version
+
+
+def can_stream(columns):
+    return columns is not None and set(columns) <= set(STREAM_COLUMNS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    accumulator = SummaryAccumulator()
+    for path in args.csv:
+        accumulator.merge(stream_accumulator(path, args.chunksize, args.workers)[0])
+    print(accumulator.summary().to_string())
+    print(f'\n{accumulator.rows:,} rows, {len(accumulator.summary()):,} majors\n')
+    print(accumulator.category_salaries().round().to_string())
@@ -0,0 +1,58 @@
+import textwrap
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def group_categories(values, keep, other='Other'):
+    # Map every value outside `keep` to `other`, working on the categorical codes
+    # so the per-row cost is one integer lookup instead of a Python call
+    values = pd.Categorical(values)
+    categories = values.categories
+    kept = categories.isin(keep)
+
+    # Keep the categories sorted so sorting by the grouped column stays alphabetical
+    grouped_categories = pd.Index(sorted(set(categories[kept]) | {other}))
+    # old code -> new code; the extra last slot sends missing values (code -1) to `other` too
+    lookup = np.append(grouped_categories.get_indexer(categories.where(kept, other)), grouped_categories.get_loc(other))
+    codes = lookup[values.codes]
+    return pd.Categorical.from_codes(codes, categories=grouped_categories).remove_unused_categories()
+
+
+def format_percent(values):
+    # Same labels as f'{x:.1%}', formatted once per distinct tenth of a percent
+    scaled = np.asarray(values, dtype='float64') * 100
+    tenths = np.rint(scaled * 10)
+
+    labels = np.empty(len(scaled), dtype=object)
+    finite = np.isfinite(scaled)
+    distinct, inverse = np.unique(tenths[finite], return_inverse=True)
+    labels[finite] = np.array([f'{t / 10:.1f}%' for t in distinct], dtype=object)[inverse]
+
+    # Values sitting on a rounding boundary (and nan/inf) go through the exact formatter
+    fraction = scaled * 10 - np.floor(scaled * 10)
+    exact = ~finite | (np.abs(fraction - 0.5) < 1e-6)
+    labels[exact] = [f'{x:.1%}' for x in np.asarray(values, dtype='float64')[exact]]
+    return labels
+
+
+@lru_cache(maxsize=65536)
+def wrap_and_truncate_label(label, width=15, max_lines=2):
+    wrapped = textwrap.wrap(label, width)
+    if len(wrapped) > max_lines:
+        wrapped = wrapped[:max_lines]  # Limit to max_lines
+        wrapped[-1] += "..."  # Add ellipsis to indicate truncation
+    return "<br>".join(wrapped)
+
+
+def wrap_labels(labels, width=15, max_lines=2):
+    # Wrap each distinct label once (and remember it across reruns), then broadcast
+    codes, uniques = pd.factorize(pd.Series(labels), use_na_sentinel=False)
+    wrapped = np.array([wrap_and_truncate_label(label, width, max_lines) for label in uniques], dtype=object)
+    return wrapped[codes]
+
+
+def stack_columns(*columns):
+    # Per-point customdata rows ([a, b] for each point) without building Python tuples
+    return np.column_stack([np.asarray(column, dtype=object) for column in columns])
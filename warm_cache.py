@@ -0,0 +1,83 @@
+"""Pre-populate the result cache with the dashboard's common states.
+
+    DATAVISU_CACHE=disk python warm_cache.py [--partition NAME ...]
+
+Run it after each data refresh, with the same DATAVISU_* settings as the
+dashboard (including DATAVISU_COMPACT_FIGURES, which changes the figures).
+It builds the rollups, the jobs chart, every category's drill-down and the
+salary chart for every sort/order/color/range combination of the default view
+(plus the browser-sorted chart, or the summary and first page for large data)
+for the dashboard's dataset -- or for each partition of DATAVISU_DATA_DIR, or
+the named ones -- so the first session after a refresh gets them from the cache.
+"""
+import argparse
+import itertools
+import sys
+import time
+
+from aggregates import DASHBOARD_COLUMNS, LARGE_DATA_ROWS, get_aggregates
+from charts import drill_down_chart, jobs_chart, salary_chart, salary_inputs_from_state
+from data_loader import load_dataset
+from registry import data_dir, get_registry
+from result_cache import CACHE_ENV, shared_cache
+
+# Build with Streamlit's plotly theme, as the dashboard does (importing this sets it as the default)
+import streamlit.elements.plotly_chart  # noqa: E402,F401,I100
+
+
+def salary_states(large_salary_data):
+    # Widget values (as session state would hold them) for the salary charts worth warming
+    for field, order, color, iqr in itertools.product(['Salary', 'Salary and Major Category'],
+                                                      ['Ascending', 'Descending'], [True, False], [False, True]):
+        yield {'salary_sort_field': field, 'salary_sort_order': order, 'salary_color': color, 'salary_iqr': iqr}
+    if large_salary_data:
+        for order, color in itertools.product(['Ascending', 'Descending'], [True, False]):
+            yield {'salary_view': 'Summary', 'salary_sort_order': order, 'salary_color': color}
+        yield {'salary_view': 'Pages'}
+    else:
+        yield {'salary_client_side': True}
+
+
+def warm(dataset):
+    aggregates = get_aggregates(dataset)
+    large_salary_data = len(aggregates.salaries) > LARGE_DATA_ROWS
+    charts = 1
+    jobs_chart(dataset, aggregates)
+    for category in aggregates.categories.index:
+        drill_down_chart(dataset, aggregates, category)
+        charts += 1
+    salary_inputs = dict.fromkeys(salary_inputs_from_state(state, large_salary_data)
+                                  for state in salary_states(large_salary_data))
+    for inputs in salary_inputs:
+        salary_chart(dataset, aggregates, inputs)
+        charts += 1
+    return charts
+
+
+def datasets(partitions):
+    if not data_dir():
+        yield 'dataset', load_dataset(columns=DASHBOARD_COLUMNS)
+        return
+    registry = get_registry()
+    names = partitions or [p.name for p in registry.partitions(columns=DASHBOARD_COLUMNS)]
+    for name in names:
+        yield name, registry.load([name], columns=DASHBOARD_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--partition', action='append', default=[],
+                        help='partition of DATAVISU_DATA_DIR to warm (repeatable; default: all)')
+    args = parser.parse_args(argv)
+    if shared_cache() is None:
+        sys.exit(f'{CACHE_ENV} is not set; nothing to warm')
+
+    for name, dataset in datasets(args.partition):
+        start = time.perf_counter()
+        charts = warm(dataset)
+        print(f'{name:<24} {dataset.version[:12]}  aggregates + {charts} charts  '
+              f'{time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()